@@ -0,0 +1,90 @@
+# alignment.py
+#
+# Census column alignment across years.
+#
+# The census tables name the same metric differently from year to year
+# ("Estimate!!Native!!..." in 2024 is "Native!!Estimate!!..." in 2016, and
+# 2008/2012 drop the "Population 25 years and over" level).
+# electionData/matches_group_alligned.csv lists, for each 2024 column, its
+# counterpart in 2020, 2016, 2012 and 2008. Features are keyed by the 2024
+# name everywhere else in the app.
+#
+# from_table() compiles that file into integer maps once: for each year, the
+# distinct source columns to read (names[year]) and, for every canonical
+# feature, its position in that list (positions[year], -1 if the year lacks
+# it). Loaders read only projection(year, features) from a census table and
+# gather() the (county, feature) matrix with one fancy-indexing step.
+
+import numpy as np
+import pandas as pd
+
+import datastore
+
+# year -> column of the alignment file holding that year's names
+ALIGNMENT_COLUMNS = {
+    '2008': 'Matched_2008',
+    '2012': 'Matched_2012',
+    '2016': 'Matched_2016',
+    '2020': 'Matched_2020',
+    '2024': '2024_Column',
+}
+YEARS = list(ALIGNMENT_COLUMNS)
+
+
+class Alignment:
+    """Per-year integer column maps for the canonical (2024-named) census features."""
+
+    def __init__(self, features, columns):
+        """`columns` maps year -> that year's column name for each feature (None where missing)."""
+        self.features = list(features)
+        self.feature_index = {feature: i for i, feature in enumerate(self.features)}
+        self.years = list(columns)
+        self.names = {}
+        self.positions = {}
+        self._lookup = {}
+        for year, year_columns in columns.items():
+            names = sorted({c for c in year_columns if c})
+            lookup = {name: i for i, name in enumerate(names)}
+            self.names[year] = names
+            self._lookup[year] = lookup
+            self.positions[year] = np.array([lookup.get(c, -1) for c in year_columns], dtype=np.int32)
+
+    def _positions(self, year, features):
+        positions = self.positions[year]
+        if features is None:
+            return positions
+        return positions[[self.feature_index[f] for f in features]]
+
+    def projection(self, year, features=None):
+        """The census columns of `year` that `features` (default: all) need."""
+        positions = self._positions(year, features)
+        return [self.names[year][i] for i in sorted(set(positions[positions >= 0].tolist()))]
+
+    def gather(self, year, df, features=None):
+        """(row, feature) float32 matrix of `features` from `year`'s census table `df` (NaN where missing)."""
+        positions = self._positions(year, features)
+        needed = [name for name in self.projection(year, features) if name in df]
+        block = df[needed].apply(pd.to_numeric, errors='coerce').to_numpy(dtype=np.float32)
+        # positions index names[year]; re-point them at the columns of `block`
+        remap = np.full(len(self.names[year]), -1, dtype=np.int32)
+        remap[[self._lookup[year][name] for name in needed]] = np.arange(len(needed))
+        columns = np.where(positions >= 0, remap[positions], -1)
+        out = np.full((len(df), len(positions)), np.nan, dtype=np.float32)
+        present = columns >= 0
+        out[:, present] = block[:, columns[present]]
+        return out
+
+
+def from_table(table):
+    """Alignment from the alignment file's DataFrame."""
+    columns = {
+        year: [None if pd.isna(name) else str(name) for name in table[column]]
+        for year, column in ALIGNMENT_COLUMNS.items() if column in table
+    }
+    return Alignment(table[ALIGNMENT_COLUMNS['2024']].astype(str), columns)
+
+
+@datastore.lazy
+def get():
+    """The compiled alignment for the current alignment file."""
+    return from_table(datastore.get('census_alignment'))
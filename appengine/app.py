@@ -1,10 +1,56 @@
+import sys
+import logging
+import threading
+
 import dash
 from dash import Dash, html, dcc, page_container
 import dash_bootstrap_components as dbc
 
-# Initialize the Dash app
-app = Dash(__name__, use_pages=True, external_stylesheets=[dbc.themes.BOOTSTRAP])
+import export
+import metrics
+import tiles
+
+# Initialize the Dash app.
+# Callback validation is off because Dash would otherwise build every page's
+# layout (and so load every page's data) on the first request to any page.
+app = Dash(
+    __name__,
+    use_pages=True,
+    external_stylesheets=[dbc.themes.BOOTSTRAP],
+    suppress_callback_exceptions=True,
+)
 server = app.server
+metrics.instrument(server)
+tiles.serve(server)
+export.serve(server)
+
+
+# --- Warmup ---
+# Pages load their data on first use via a get_data() function. App Engine
+# calls /_ah/warmup on new instances before routing traffic to them; we answer
+# straight away and prime every page in the background. Each page's get_data()
+# preloads only the sources (and census columns) it reads, so nothing keeps
+# whole census tables around.
+_warmup_started = threading.Event()
+
+
+def warm_pages():
+    _warmup_started.set()
+    for page in dash.page_registry.values():
+        get_data = getattr(sys.modules.get(page['module']), 'get_data', None)
+        if get_data is not None:
+            try:
+                get_data()
+            except Exception:
+                logging.exception('Warmup of %s failed', page['module'])
+
+
+@server.route('/_ah/warmup')
+def warmup():
+    if not _warmup_started.is_set():
+        _warmup_started.set()
+        threading.Thread(target=warm_pages, name='warmup', daemon=True).start()
+    return '', 200
 
 # Main layout
 app.layout = dbc.Container([
@@ -21,6 +67,9 @@ app.layout = dbc.Container([
                     dbc.NavLink("Project Objective", href="/objective", active="exact"),
                     dbc.NavLink("Analytical Methods", href="/methods", active="exact"),
                     dbc.NavLink("Major Findings", href="/findings", active="exact"),
+                    dbc.NavLink("County Swing", href="/swing", active="exact"),
+                    dbc.NavLink("Model Evaluation", href="/evaluation", active="exact"),
+                    dbc.NavLink("What-If Scenarios", href="/whatif", active="exact"),
                 ],
                 vertical=True,
                 pills=True,
@@ -35,5 +84,6 @@ app.layout = dbc.Container([
 ], fluid=True)
 
 if __name__ == "__main__":
+    metrics.reset()
     app.run(debug=True)
 
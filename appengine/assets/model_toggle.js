@@ -0,0 +1,69 @@
+// Client-side model toggle for the home page (see CLIENTSIDE_MODEL_TOGGLE in
+// pages/home.py). The 'model-predictions' store holds every model's
+// Predicted_Ratio and Party per county, so switching models only recolors the
+// figures already in the browser.
+
+window.dash_clientside = Object.assign({}, window.dash_clientside, {
+    home: {
+        recolorPrediction: function (model, store, figure) {
+            if (!store || !figure) {
+                return window.dash_clientside.no_update;
+            }
+            const predictions = store.models[model];
+            const ratio = {};
+            predictions.Name.forEach(function (name, i) {
+                ratio[name] = predictions.Predicted_Ratio[i];
+            });
+            const data = figure.data.map(function (trace) {
+                return Object.assign({}, trace, {
+                    z: trace.locations.map(function (name) { return ratio[name]; })
+                });
+            });
+            return withTitle(figure, data, store.titles['prediction-graph'], model);
+        },
+
+        recolorParty: function (model, store, figure) {
+            if (!store || !figure) {
+                return window.dash_clientside.no_update;
+            }
+            const predictions = store.models[model];
+            // px draws one trace per party; move each county to its predicted party's trace.
+            const data = withPartyTraces(figure.data, predictions.Party, store.colors).map(function (trace) {
+                const locations = predictions.Name.filter(function (name, i) {
+                    return predictions.Party[i] === trace.name;
+                });
+                return Object.assign({}, trace, {
+                    locations: locations,
+                    z: locations.map(function () { return 1; })
+                });
+            });
+            return withTitle(figure, data, store.titles['right-choropleth'], model);
+        }
+    }
+});
+
+function withTitle(figure, data, template, model) {
+    const title = Object.assign({}, figure.layout.title, {text: template.replace('{model}', model)});
+    return Object.assign({}, figure, {
+        data: data,
+        layout: Object.assign({}, figure.layout, {title: title})
+    });
+}
+
+// The default model's figure only has traces for the parties it predicts;
+// add one, styled like px would, for every other party this model predicts.
+function withPartyTraces(traces, parties, colors) {
+    const present = traces.map(function (trace) { return trace.name; });
+    const template = traces[0];
+    const added = parties.filter(function (party, i) {
+        return present.indexOf(party) < 0 && parties.indexOf(party) === i;
+    }).map(function (party) {
+        return Object.assign({}, template, {
+            name: party,
+            legendgroup: party,
+            colorscale: [[0, colors[party]], [1, colors[party]]],
+            hovertemplate: template.hovertemplate.replace('Party=' + template.name, 'Party=' + party)
+        });
+    });
+    return traces.concat(added);
+}
@@ -0,0 +1,220 @@
+# benchmark.py
+#
+# Offline performance benchmarks for the dashboard.
+#
+#   python benchmark.py [--out results.json] [--repeat 20] [--data-dir DIR]
+#   python benchmark.py --compare baseline.json [--tolerance 0.2]
+#
+# The measurements run in a fresh child process so boot time and peak RSS
+# are those of a cold worker. The datastore reads every source from
+# LOCAL_DATA_DIR (default: stand-ins generated in a temporary directory:
+# the election CSVs from electionData/ plus synthetic census tables with each
+# year's real column names), and DATA_CACHE_DIR points at an empty directory,
+# so nothing touches GCS or GitHub.
+#
+# Recorded:
+#   boot        import of app (every page module) and each page's get_data()
+#   callbacks   per callback and input value: p50/p95 latency with the figure
+#               cache bypassed and through it, and the size of the response
+#               as Dash serializes it. For the model toggle that means both
+#               the full-figure builders (update_*, which draw the initial
+#               maps) and the Patch callbacks that answer a toggle
+#               (recolor_*). The child runs with CLIENTSIDE_MODEL_TOGGLE=0 so
+#               the latter exist; by default the browser recolors the maps
+#               itself and the toggle sends nothing.
+#   peak_rss_mb peak resident memory of the child process
+#
+# --compare runs the benchmarks (or reads --out if --no-run is given) and
+# flags every metric that got worse than the baseline by more than
+# --tolerance (relative); exits 1 if any did.
+
+import os
+import sys
+import json
+import time
+import shutil
+import platform
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+import pandas as pd
+from plotly.io.json import to_json_plotly
+
+import alignment
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DATA_DIR = os.path.join(os.path.dirname(APP_DIR), 'electionData')
+CENSUS_YEARS = ['2008', '2012', '2016', '2020', '2024']
+ALIGNMENT_FILE = 'matches_group_alligned.csv'
+# Time differences below this are treated as noise in --compare.
+MIN_DELTA_MS = 2.0
+
+
+# --- Stand-in data ---
+
+def make_stand_ins(out_dir, seed=0):
+    """Fill `out_dir` with a local copy of every datastore source."""
+    os.makedirs(out_dir, exist_ok=True)
+    for name in os.listdir(REPO_DATA_DIR):
+        if name.startswith(('pres_election_', '2024_prediction_')) or name == ALIGNMENT_FILE:
+            shutil.copy(os.path.join(REPO_DATA_DIR, name), out_dir)
+    counties = pd.read_csv(os.path.join(REPO_DATA_DIR, 'pres_election_2024.csv'))['Name']
+    aligned = pd.read_csv(os.path.join(REPO_DATA_DIR, ALIGNMENT_FILE))
+    rng = np.random.default_rng(seed)
+    for year in CENSUS_YEARS:
+        columns = aligned[alignment.ALIGNMENT_COLUMNS[year]].drop_duplicates()
+        df = pd.DataFrame(rng.uniform(0, 100, size=(len(counties), len(columns))).round(1), columns=columns)
+        df.insert(0, 'Name', counties)
+        df.to_csv(os.path.join(out_dir, f'df_{year}.csv'), index=False)
+    return out_dir
+
+
+# --- Measurements (child process) ---
+
+def _percentiles(samples):
+    ms = np.asarray(samples) * 1000
+    return {'p50_ms': float(np.percentile(ms, 50)), 'p95_ms': float(np.percentile(ms, 95))}
+
+
+def _time_callback(fn, value, repeat):
+    # Bypass the figure cache (if any) for the uncached numbers
+    build = getattr(fn, '__wrapped__', fn)
+    uncached = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        payload = to_json_plotly(build(value))
+        uncached.append(time.perf_counter() - start)
+    result = {'uncached': _percentiles(uncached), 'bytes': len(payload.encode())}
+    if build is not fn:
+        fn(value)
+        cached = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn(value)
+            cached.append(time.perf_counter() - start)
+        result['cached'] = _percentiles(cached)
+    return result
+
+
+def measure(repeat):
+    import resource
+
+    sys.path.insert(0, APP_DIR)
+    boot = {}
+    start = time.perf_counter()
+    import app
+    boot['import_app_s'] = time.perf_counter() - start
+
+    home = sys.modules['pages.home']
+    findings = sys.modules['pages.findings']
+    for name, page in (('home', home), ('findings', findings)):
+        start = time.perf_counter()
+        page.get_data()
+        boot[f'{name}_data_s'] = time.perf_counter() - start
+
+    models = list(home.get_data()['model_predictions'])
+    data = findings.get_data()
+    inputs = {
+        'home.update_prediction': (home.update_prediction, models),
+        'home.update_color_map': (home.update_color_map, models),
+        'home.recolor_prediction': (home.recolor_prediction, models),
+        'home.recolor_party': (home.recolor_party, models),
+        'findings.update_positive_figure': (findings.update_positive_figure, list(data['positive'])),
+        'findings.update_negative_figure': (findings.update_negative_figure, list(data['negative'])),
+    }
+    callbacks = {
+        name: {value: _time_callback(fn, value, repeat) for value in values}
+        for name, (fn, values) in inputs.items()
+    }
+
+    return {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': repeat,
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        },
+        'boot': boot,
+        'callbacks': callbacks,
+        'peak_rss_mb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024,
+    }
+
+
+def run(repeat=20, data_dir=None, model_dir=None):
+    """Run the benchmarks in a cold child process and return its results."""
+    with tempfile.TemporaryDirectory(prefix='election-bench-') as tmp:
+        env = dict(os.environ, DATA_CACHE_DIR=os.path.join(tmp, 'cache'))
+        env['LOCAL_DATA_DIR'] = data_dir or make_stand_ins(os.path.join(tmp, 'data'))
+        env['MODEL_DIR'] = model_dir or os.path.join(tmp, 'no-models')
+        env['CLIENTSIDE_MODEL_TOGGLE'] = '0'
+        out = os.path.join(tmp, 'results.json')
+        subprocess.run([sys.executable, os.path.abspath(__file__), '--child', out, '--repeat', str(repeat)],
+                       env=env, cwd=APP_DIR, check=True)
+        with open(out) as f:
+            return json.load(f)
+
+
+# --- Comparison ---
+
+def flatten(results, prefix=''):
+    """{'a': {'b': 1}} -> {'a.b': 1}, numeric leaves only."""
+    flat = {}
+    for key, value in results.items():
+        path = f'{prefix}{key}'
+        if isinstance(value, dict):
+            flat.update(flatten(value, path + '.'))
+        elif isinstance(value, (int, float)) and key != 'repeat':
+            flat[path] = value
+    return flat
+
+
+def compare(results, baseline, tolerance=0.2):
+    """Metrics worse than the baseline by more than `tolerance`: [(metric, baseline, current)]."""
+    current, before = flatten(results), flatten(baseline)
+    regressions = []
+    for metric, old in before.items():
+        new = current.get(metric)
+        if new is None or new <= old * (1 + tolerance):
+            continue
+        delta_ms = (new - old) * (1000 if metric.endswith('_s') else 1)
+        if metric.endswith(('_ms', '_s')) and delta_ms < MIN_DELTA_MS:
+            continue
+        regressions.append((metric, old, new))
+    return regressions
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark boot time, callback latency, payload size and memory.')
+    parser.add_argument('--out', default='benchmark-results.json')
+    parser.add_argument('--repeat', type=int, default=20)
+    parser.add_argument('--data-dir', default=None, help='LOCAL_DATA_DIR to use instead of generated stand-ins')
+    parser.add_argument('--model-dir', default=None, help='MODEL_DIR to serve (default: none, the prediction CSVs)')
+    parser.add_argument('--compare', metavar='BASELINE', help='flag regressions against this results file')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--no-run', action='store_true', help='with --compare, compare --out instead of running')
+    parser.add_argument('--child', metavar='OUT', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        with open(args.child, 'w') as f:
+            json.dump(measure(args.repeat), f)
+        sys.exit(0)
+
+    if args.compare and args.no_run:
+        with open(args.out) as f:
+            results = json.load(f)
+    else:
+        results = run(args.repeat, args.data_dir, args.model_dir)
+        with open(args.out, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f'wrote {args.out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for metric, old, new in regressions:
+            print(f'REGRESSION {metric}: {old:.4g} -> {new:.4g}')
+        print(f'{len(regressions)} regression(s) against {args.compare}')
+        sys.exit(1 if regressions else 0)
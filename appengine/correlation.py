@@ -0,0 +1,90 @@
+# correlation.py
+#
+# Correlation of every census feature with the Dem/Rep vote ratio, for every
+# year, computed as one masked matrix operation over a FeatureStore.
+#
+# The findings page picks its positive / negative metrics from top_k() of
+# this table instead of a hand-maintained list. Results are cached on disk
+# keyed by the data version of the census and election tables, so workers
+# only recompute after the underlying data changes (and then it takes
+# milliseconds, not a notebook rerun).
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import datastore
+import feature_store
+
+CACHE_DIR = os.path.join(datastore.CACHE_DIR, 'correlations')
+
+
+def pearson(x, y):
+    """Pearson r along the last axis of `x` and `y` (broadcastable), ignoring NaN pairs."""
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=-1)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        dx = np.where(valid, x - (np.where(valid, x, 0).sum(axis=-1) / n)[..., None], 0)
+        dy = np.where(valid, y - (np.where(valid, y, 0).sum(axis=-1) / n)[..., None], 0)
+        return (dx * dy).sum(axis=-1) / np.sqrt((dx * dx).sum(axis=-1) * (dy * dy).sum(axis=-1))
+
+
+def rank(x):
+    """Average ranks along the last axis, NaN left in place."""
+    flat = np.asarray(x, dtype=float).reshape(-1, np.shape(x)[-1])
+    return pd.DataFrame(flat.T).rank(method='average').to_numpy().T.reshape(np.shape(x))
+
+
+def spearman(x, y):
+    """Spearman rho along the last axis: Pearson r of the ranks."""
+    x, y = np.broadcast_arrays(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    # Rank only over pairs where both sides are present
+    valid = ~(np.isnan(x) | np.isnan(y))
+    return pearson(rank(np.where(valid, x, np.nan)), rank(np.where(valid, y, np.nan)))
+
+
+def compute(store):
+    """DataFrame indexed by feature: pearson_<year>, spearman_<year>, pearson_mean, spearman_mean."""
+    x = store.select(store.features)          # (feature, year, county)
+    y = store.ratio[None, :, :]               # (1, year, county)
+    r = pearson(x, y)                         # (feature, year)
+    rho = spearman(x, y)
+    table = pd.DataFrame(index=pd.Index(store.features, name='feature'))
+    for j, year in enumerate(store.years):
+        table[f'pearson_{year}'] = r[:, j]
+        table[f'spearman_{year}'] = rho[:, j]
+    table['pearson_mean'] = np.nanmean(r, axis=1)
+    table['spearman_mean'] = np.nanmean(rho, axis=1)
+    return table
+
+
+def get(years):
+    """compute() for the aligned census features of `years`, cached by data version."""
+    sources = [f'df_{year}' for year in years] + feature_store.result_sources(years) + ['census_alignment']
+    datastore.preload(sources, columns={f'df_{year}': ['Name'] for year in years})
+    version = datastore.version(sources)
+    path = os.path.join(CACHE_DIR, f'correlations.{version}.feather')
+    if os.path.exists(path):
+        return pd.read_feather(path).set_index('feature')
+    table = compute(feature_store.build_aligned(years))
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    table.reset_index().to_feather(tmp)
+    os.replace(tmp, path)
+    return table
+
+
+def top_k(table, k=5, by='pearson_mean'):
+    """(most positive, most negative) feature names by the `by` column."""
+    ranked = table[by].dropna().sort_values()
+    return list(ranked.index[::-1][:k]), list(ranked.index[:k])
+
+
+def describe(feature):
+    """Readable label for a census column name: its last level, then the first two in brackets."""
+    parts = [p for p in feature.split('!!') if p not in ('Estimate', 'Percent')]
+    if len(parts) < 2:
+        return feature
+    return f"{parts[-1]} ({', '.join(parts[:2])})"
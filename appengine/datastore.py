@@ -0,0 +1,443 @@
+# datastore.py
+#
+# Shared, local-first data access for the pages.
+#
+# Every dataset the app reads (the cleaned census/election tables in the GCS
+# bucket and the model prediction CSVs on GitHub) is
+# registered in SOURCES below and read through load() and its helpers.
+#
+# A load goes through these steps:
+#   1. If LOCAL_DATA_DIR is set, the file is read from that directory instead
+#      of the bucket / URL (tests, offline runs, benchmarks).
+#   2. Otherwise a snapshot in CACHE_DIR that was checked less than
+#      DATA_MAX_AGE seconds ago is used without touching the network.
+#   3. Otherwise the remote copy is revalidated with a conditional request
+#      (GCS generation / HTTP ETag). Unchanged data is not downloaded again;
+#      changed data replaces the snapshot.
+#   4. If the remote is unreachable the last snapshot is used, and failing
+#      that the copy shipped in appengine/electionData/ (refreshed from the
+#      repo's electionData/ by `python datastore.py bundle` before deploying).
+#      The census tables (df_*) are too large to ship and have no such copy.
+#
+# Snapshots are stored as Feather (Arrow IPC) files, named after the remote
+# version so a new generation never overwrites a file another worker may be
+# reading.
+
+import os
+import json
+import shutil
+import hashlib
+import argparse
+import functools
+import time
+import tempfile
+import threading
+import logging
+from concurrent.futures import ThreadPoolExecutor, wait
+from io import BytesIO
+
+import pandas as pd
+import requests
+
+logger = logging.getLogger(__name__)
+
+APP_DIR = os.path.dirname(os.path.abspath(__file__))
+
+BUCKET_NAME = os.environ.get('BUCKET_NAME', 'cleaned_dfs_census_data')
+LOCAL_DATA_DIR = os.environ.get('LOCAL_DATA_DIR')
+CACHE_DIR = os.environ.get('DATA_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'election-data-cache'))
+DATA_MAX_AGE = float(os.environ.get('DATA_MAX_AGE', 600))
+REQUEST_TIMEOUT = float(os.environ.get('DATA_REQUEST_TIMEOUT', 10))
+STARTUP_DEADLINE = float(os.environ.get('DATA_STARTUP_DEADLINE', 20))
+
+# Copies of the data committed to the repo. App Engine only uploads the
+# appengine/ directory, so BUNDLE_DIR (filled by bundle()) is what production
+# falls back to; the repo's electionData/ only exists in a checkout.
+REPO_DATA_DIR = os.path.join(os.path.dirname(APP_DIR), 'electionData')
+BUNDLE_DIR = os.path.join(APP_DIR, 'electionData')
+BUNDLED_DIRS = [d for d in (os.environ.get('BUNDLED_DATA_DIR'), BUNDLE_DIR, REPO_DATA_DIR) if d]
+
+GITHUB_RAW = 'https://raw.githubusercontent.com/MoriguchiBrandon/California-Presidential-Election-Analysis/main/electionData/'
+
+# name -> where the data lives. 'file' is the blob name / bundled file name.
+# Every source except the df_* census tables has a bundled copy.
+SOURCES = {
+    'df_2008': {'kind': 'gcs', 'file': 'df_2008.csv'},
+    'df_2012': {'kind': 'gcs', 'file': 'df_2012.csv'},
+    'df_2016': {'kind': 'gcs', 'file': 'df_2016.csv'},
+    'df_2020': {'kind': 'gcs', 'file': 'df_2020.csv'},
+    'df_2024': {'kind': 'gcs', 'file': 'df_2024.csv'},
+    'pres_election_2012': {'kind': 'gcs', 'file': 'pres_election_2012.csv'},
+    'pres_election_2016': {'kind': 'gcs', 'file': 'pres_election_2016.csv'},
+    'pres_election_2020': {'kind': 'gcs', 'file': 'pres_election_2020.csv'},
+    'pres_election_2024': {'kind': 'gcs', 'file': 'pres_election_2024.csv'},
+    'census_alignment': {'kind': 'http', 'file': 'matches_group_alligned.csv', 'url': GITHUB_RAW + 'matches_group_alligned.csv'},
+    'pres_election_history': {'kind': 'http', 'file': 'pres_election_history.csv', 'url': GITHUB_RAW + 'pres_election_history.csv'},
+    'prediction_MLP': {'kind': 'http', 'file': '2024_prediction_NN.csv', 'url': GITHUB_RAW + '2024_prediction_NN.csv'},
+    'prediction_RF': {'kind': 'http', 'file': '2024_prediction_RandomForest.csv', 'url': GITHUB_RAW + '2024_prediction_RandomForest.csv'},
+    'prediction_GB': {'kind': 'http', 'file': '2024_prediction_GradientBoost.csv', 'url': GITHUB_RAW + '2024_prediction_GradientBoost.csv'},
+}
+
+# name -> {'origin': local|snapshot|remote|bundled, 'version': ..., 'seconds': ...}
+load_report = {}
+
+# name (or (name, columns)) -> dataset, filled by get() / preload(). Shared
+# between pages, so callers must treat the frames as read-only.
+_loaded = {}
+_loaded_lock = threading.Lock()
+
+_client = None
+_client_lock = threading.Lock()
+_manifest_lock = threading.Lock()
+
+
+class DataUnavailable(RuntimeError):
+    """Raised when a source can't be read from anywhere, bundled copy included."""
+
+
+def _gcs_client():
+    # Built on first use so importing this module never needs credentials.
+    global _client
+    with _client_lock:
+        if _client is None:
+            from google.cloud import storage
+            _client = storage.Client()
+        return _client
+
+
+def _after_fork():
+    # A forked worker (gunicorn preload) gets its own GCS client, and fresh
+    # locks in case a background download held one at fork time.
+    global _client, _client_lock, _manifest_lock, _loaded_lock
+    _client = None
+    _client_lock = threading.Lock()
+    _manifest_lock = threading.Lock()
+    _loaded_lock = threading.Lock()
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+# --- Snapshot manifest ---
+
+def _manifest_path():
+    return os.path.join(CACHE_DIR, 'manifest.json')
+
+
+def _read_manifest():
+    try:
+        with open(_manifest_path()) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _update_manifest(name, entry):
+    with _manifest_lock:
+        manifest = _read_manifest()
+        manifest[name] = entry
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        tmp = _manifest_path() + f'.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            json.dump(manifest, f)
+        os.replace(tmp, _manifest_path())
+
+
+def _snapshot_path(name, version):
+    safe_version = ''.join(c if c.isalnum() else '_' for c in str(version))
+    return os.path.join(CACHE_DIR, f'{name}.{safe_version}.feather')
+
+
+def _write_snapshot(name, version, df):
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    path = _snapshot_path(name, version)
+    tmp = path + f'.{os.getpid()}.tmp'
+    df.reset_index(drop=True).to_feather(tmp)
+    os.replace(tmp, path)
+    return path
+
+
+def _read_snapshot(path, columns=None):
+    return pd.read_feather(path, columns=columns)
+
+
+def _parse(raw, columns=None):
+    return pd.read_csv(BytesIO(raw), usecols=columns)
+
+
+# --- Remote fetchers ---
+# Each returns (version, raw_bytes); raw_bytes is None when the remote copy
+# still matches known_version.
+
+def _fetch_gcs(source, known_version, timeout):
+    from google.api_core.exceptions import NotModified
+    blob = _gcs_client().bucket(BUCKET_NAME).blob(source['file'])
+    kwargs = {'timeout': timeout}
+    if known_version is not None:
+        kwargs['if_generation_not_match'] = int(known_version)
+    try:
+        raw = blob.download_as_bytes(**kwargs)
+    except NotModified:
+        return known_version, None
+    return str(blob.generation), raw
+
+
+def _fetch_http(source, known_version, timeout):
+    headers = {'If-None-Match': known_version} if known_version else {}
+    response = requests.get(source['url'], headers=headers, timeout=timeout)
+    if response.status_code == 304:
+        return known_version, None
+    response.raise_for_status()
+    return response.headers.get('ETag') or _content_version(response.content), response.content
+
+
+FETCHERS = {'gcs': _fetch_gcs, 'http': _fetch_http}
+
+
+def _bundled_path(file_name):
+    for directory in BUNDLED_DIRS:
+        path = os.path.join(directory, file_name)
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def _content_version(raw):
+    return 'sha1-' + hashlib.sha1(raw).hexdigest()
+
+
+def _read_file(path, columns=None):
+    with open(path, 'rb') as f:
+        raw = f.read()
+    return _parse(raw, columns), _content_version(raw)
+
+
+# --- Public API ---
+
+def load(name, timeout=None, max_age=None, columns=None, report=None):
+    """Return the dataset registered as `name` as a DataFrame.
+
+    `columns` limits a table to those columns. Snapshots always hold the full
+    table, but only the requested columns are parsed / read back from them.
+    Where the data came from is recorded in `report` (default: load_report).
+    """
+    source = SOURCES[name]
+    timeout = REQUEST_TIMEOUT if timeout is None else timeout
+    max_age = DATA_MAX_AGE if max_age is None else max_age
+    report = load_report if report is None else report
+    start = time.perf_counter()
+    fell_back = False
+
+    def done(obj, origin, version):
+        report[name] = {
+            'origin': origin,
+            'version': version,
+            'seconds': time.perf_counter() - start,
+            'fell_back': fell_back,
+        }
+        return obj
+
+    if LOCAL_DATA_DIR:
+        obj, version = _read_file(os.path.join(LOCAL_DATA_DIR, source['file']), columns)
+        return done(obj, 'local', version)
+
+    entry = _read_manifest().get(name)
+    snapshot = entry['path'] if entry and os.path.exists(entry['path']) else None
+    if snapshot and time.time() - entry['checked'] < max_age:
+        return done(_read_snapshot(snapshot, columns), 'snapshot', entry['version'])
+
+    try:
+        known_version = entry['version'] if snapshot else None
+        version, raw = FETCHERS[source['kind']](source, known_version, timeout)
+        if raw is None:
+            _update_manifest(name, dict(entry, checked=time.time()))
+            return done(_read_snapshot(snapshot, columns), 'snapshot', version)
+        obj = _parse(raw)
+        path = _write_snapshot(name, version, obj)
+        _update_manifest(name, {'version': version, 'path': path, 'checked': time.time()})
+        if snapshot and snapshot != path:
+            try:
+                os.remove(snapshot)
+            except OSError:
+                pass
+        return done(obj if columns is None else obj[columns], 'remote', version)
+    except Exception as exc:
+        logger.warning('Could not refresh %s (%s), falling back to a local copy', name, exc)
+        fell_back = True
+
+    return _load_offline(name, entry, done, columns)
+
+
+def _load_offline(name, entry, done, columns=None):
+    source = SOURCES[name]
+    if entry and os.path.exists(entry['path']):
+        return done(_read_snapshot(entry['path'], columns), 'snapshot', entry['version'])
+    path = _bundled_path(source['file'])
+    if path is None:
+        raise DataUnavailable(f'{name}: remote unreachable and no bundled copy of {source["file"]}')
+    obj, version = _read_file(path, columns)
+    return done(obj, 'bundled', version)
+
+
+def load_offline(name, columns=None):
+    """Like load(), but never touches the network: last snapshot, else the bundled copy."""
+    start = time.perf_counter()
+
+    def done(obj, origin, version):
+        load_report[name] = {
+            'origin': origin,
+            'version': version,
+            'seconds': time.perf_counter() - start,
+            'fell_back': True,
+        }
+        return obj
+
+    return _load_offline(name, _read_manifest().get(name), done, columns)
+
+
+def read_columns(name, columns=None):
+    """`columns` of `name` read from the copy load() last settled on, bypassing the in-process cache.
+
+    Never touches the network and doesn't change load_report. For reads whose
+    projection varies per request (the export API), which shouldn't each be
+    kept in memory or revalidate the remote.
+    """
+    source = SOURCES[name]
+    if LOCAL_DATA_DIR:
+        return _read_file(os.path.join(LOCAL_DATA_DIR, source['file']), columns)[0]
+    entry = _read_manifest().get(name)
+    if entry and os.path.exists(entry['path']):
+        return _read_snapshot(entry['path'], columns)
+    path = _bundled_path(source['file'])
+    if path is None:
+        raise DataUnavailable(f'{name}: no snapshot or bundled copy of {source["file"]}')
+    return _read_file(path, columns)[0]
+
+
+def preload(names=None, timeout=None, deadline=None, columns=None):
+    """Load `names` (default: every source) concurrently into the in-process cache.
+
+    Each source gets `timeout` seconds per request; whatever hasn't finished
+    after `deadline` seconds overall is served from its snapshot or bundled
+    copy instead (the download keeps going in the background and refreshes
+    the snapshot for next time, but load_report keeps describing the copy
+    that is being served). `columns` optionally maps a name to the
+    columns to keep, as for load(). Returns the load report for these names.
+    """
+    columns = columns or {}
+    requested = list(names or SOURCES)
+    names = [n for n in requested if _key(n, columns.get(n)) not in _loaded]
+    deadline = STARTUP_DEADLINE if deadline is None else deadline
+    start = time.perf_counter()
+    if names:
+        reports = {}
+        pool = ThreadPoolExecutor(max_workers=len(names), thread_name_prefix='preload')
+        futures = {pool.submit(load, name, timeout=timeout, columns=columns.get(name), report=reports): name
+                   for name in names}
+        done, pending = wait(futures, timeout=deadline)
+        pool.shutdown(wait=False)
+        for future in done:
+            name = futures[future]
+            try:
+                _store(_key(name, columns.get(name)), future.result())
+                load_report[name] = reports[name]
+            except (DataUnavailable, OSError) as exc:
+                _report_failure(name, exc, start)
+        for future in pending:
+            name = futures[future]
+            logger.warning('%s missed the %.1fs startup deadline', name, deadline)
+            try:
+                _store(_key(name, columns.get(name)), load_offline(name, columns.get(name)))
+            except (DataUnavailable, OSError) as exc:
+                _report_failure(name, exc, start)
+            load_report[name]['deadline_missed'] = True
+        for name in names:
+            entry = load_report[name]
+            logger.info('loaded %s from %s in %.3fs', name, entry['origin'], entry['seconds'])
+    logger.info('preload finished in %.3fs', time.perf_counter() - start)
+    return {name: load_report.get(name) for name in requested}
+
+
+def _report_failure(name, exc, start):
+    logger.error('%s', exc)
+    load_report[name] = {
+        'origin': 'failed',
+        'error': str(exc),
+        'seconds': time.perf_counter() - start,
+        'fell_back': True,
+    }
+
+
+def _key(name, columns):
+    return name if columns is None else (name, tuple(columns))
+
+
+def _store(key, obj):
+    with _loaded_lock:
+        return _loaded.setdefault(key, obj)
+
+
+def get(name, columns=None):
+    """Return the dataset `name` from the in-process cache, loading it on first use."""
+    key = _key(name, columns)
+    try:
+        return _loaded[key]
+    except KeyError:
+        return _store(key, load(name, columns=columns))
+
+
+def version(names):
+    """Short fingerprint of the loaded versions of `names`; changes whenever any of them does."""
+    parts = [f"{name}={load_report.get(name, {}).get('version')}" for name in sorted(names)]
+    return hashlib.sha1('|'.join(parts).encode()).hexdigest()[:16]
+
+
+def lazy(build):
+    """Decorator: call `build` once, on first use, and reuse its result.
+
+    Concurrent first callers wait for the one build instead of repeating it.
+    Pages use this for their datasets and prebuilt figures so nothing is
+    loaded until a page (or the warmup handler) actually asks for it.
+    """
+    lock = threading.Lock()
+    result = []
+
+    @functools.wraps(build)
+    def wrapper():
+        if not result:
+            with lock:
+                if not result:
+                    result.append(build())
+        return result[0]
+
+    wrapper.is_loaded = lambda: bool(result)
+    return wrapper
+
+
+def get_predictions():
+    """Model name -> prediction DataFrame (Name, Predicted_Ratio, Ratio, Error)."""
+    return {model: get(f'prediction_{model}') for model in ('MLP', 'RF', 'GB')}
+
+
+def bundle(src=REPO_DATA_DIR, dst=BUNDLE_DIR):
+    """Copy the bundled fallback of every source from `src` into `dst` (appengine/electionData).
+
+    Run before deploying, after ingest.py or training.py rewrote the files.
+    Returns the file names copied.
+    """
+    os.makedirs(dst, exist_ok=True)
+    copied = []
+    for source in SOURCES.values():
+        path = os.path.join(src, source['file'])
+        if os.path.exists(path):
+            shutil.copyfile(path, os.path.join(dst, source['file']))
+            copied.append(source['file'])
+    return copied
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Data layer maintenance.')
+    parser.add_argument('command', choices=['bundle'],
+                        help='bundle: copy the fallback data files into appengine/electionData for deployment')
+    args = parser.parse_args()
+    print(json.dumps(bundle()))
@@ -0,0 +1,95 @@
+# evaluation.py
+#
+# Accuracy of the served 2024 predictions against the actual results.
+#
+# Per model: MAE and RMSE of the predicted Dem/Rep ratio, party-call accuracy
+# (predicted and actual ratio on the same side of 1) and vote-weighted MAE
+# (each county weighted by its two-party vote total). Confidence intervals
+# come from a county-level bootstrap: one (resamples, counties) index array
+# is drawn once and applied to every model's errors together, so 10,000
+# resamples are a few array operations rather than a Python loop.
+#
+# Results are cached on disk keyed by the prediction and results versions,
+# like the correlation table.
+
+import os
+
+import numpy as np
+import pandas as pd
+
+import datastore
+
+CACHE_DIR = os.path.join(datastore.CACHE_DIR, 'evaluation')
+RESAMPLES = 10_000
+CONFIDENCE = 0.95
+METRICS = ['MAE', 'RMSE', 'Accuracy', 'Weighted MAE']
+
+
+def scores(predicted, actual, weights):
+    """Every metric along the last axis of (..., counties) arrays: dict of (...) arrays."""
+    error = predicted - actual
+    abs_error = np.abs(error)
+    return {
+        'MAE': abs_error.mean(axis=-1),
+        'RMSE': np.sqrt((error ** 2).mean(axis=-1)),
+        'Accuracy': ((predicted >= 1) == (actual >= 1)).mean(axis=-1),
+        'Weighted MAE': (abs_error * weights).sum(axis=-1) / weights.sum(axis=-1),
+    }
+
+
+def bootstrap(predicted, actual, weights, n=RESAMPLES, seed=0):
+    """Bootstrap distribution of every metric: dict of (models, n) arrays.
+
+    `predicted` is (models, counties); `actual` and `weights` are (counties,).
+    """
+    rng = np.random.default_rng(seed)
+    idx = rng.integers(0, predicted.shape[-1], size=(n, predicted.shape[-1]))   # (n, counties)
+    return scores(predicted[:, idx], actual[idx][None], weights[idx][None])
+
+
+def evaluate(frames, results, n=RESAMPLES, seed=0):
+    """DataFrame indexed by model with each metric and its <metric>_low / <metric>_high interval.
+
+    `frames` maps model -> prediction DataFrame (Name, Predicted_Ratio);
+    `results` is the pres_election table the predictions are scored against.
+    """
+    models = list(frames)
+    results = results.set_index('Name')
+    names = sorted(set(results.index).intersection(*(df['Name'] for df in frames.values())))
+    actual = results.loc[names, 'Ratio'].to_numpy(float)
+    weights = (results.loc[names, 'Democratic Vote Total'] + results.loc[names, 'Republican Vote Total']).to_numpy(float)
+    predicted = np.vstack([frames[m].set_index('Name').loc[names, 'Predicted_Ratio'].to_numpy(float) for m in models])
+
+    point = scores(predicted, actual, weights)
+    resampled = bootstrap(predicted, actual, weights, n, seed)
+    tail = (1 - CONFIDENCE) / 2 * 100
+    table = pd.DataFrame(index=pd.Index(models, name='model'))
+    for metric in METRICS:
+        table[metric] = point[metric]
+        table[f'{metric}_low'], table[f'{metric}_high'] = np.percentile(resampled[metric], [tail, 100 - tail], axis=1)
+    return table
+
+
+def repeated_predictions(frames, min_counties=2):
+    """model -> {predicted value: [counties]} for values predicted for at least `min_counties` counties."""
+    out = {}
+    for model, df in frames.items():
+        groups = df.groupby(df['Predicted_Ratio'].round(6))['Name'].apply(list)
+        groups = groups[groups.apply(len) >= min_counties]
+        if len(groups):
+            out[model] = groups.to_dict()
+    return out
+
+
+def get(frames, version, year='2024'):
+    """evaluate() for the served predictions, cached per prediction / results version."""
+    results = datastore.get(f'pres_election_{year}')
+    path = os.path.join(CACHE_DIR, f'evaluation.{version}.{datastore.version([f"pres_election_{year}"])}.feather')
+    if os.path.exists(path):
+        return pd.read_feather(path).set_index('model')
+    table = evaluate(frames, results)
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    tmp = f'{path}.{os.getpid()}.tmp'
+    table.reset_index().to_feather(tmp)
+    os.replace(tmp, path)
+    return table
@@ -0,0 +1,185 @@
+# export.py
+#
+# Read-only bulk export of the tables behind the pages.
+#
+#   GET /api/export                          JSON list of datasets
+#   GET /api/export/<dataset>.<format>       arrow (IPC stream) | parquet | csv
+#         ?column=<name>&column=...          only these columns (Name is always included)
+#         ?county=<name>&county=...          only these counties
+#
+# Datasets:
+#   merged_<year>          the census table for <year> with that year's Ratio
+#                          (the frame the findings plots are drawn from)
+#   pres_election_<year>   election results, plus pres_election_history
+#   predictions_<model>    the served 2024 predictions (MLP, RF, GB)
+#
+# Every response carries an ETag built from the data version, the format and
+# the query, so a client that sends If-None-Match gets a 304 until the data
+# changes. Bodies are streamed: rows are serialized in CHUNK_ROWS batches
+# (CSV chunks, Arrow record batches, Parquet row groups) and sent as they
+# are written, so a large table is never serialized in memory in one piece.
+# Column projection is pushed down to the census table reads, which come
+# straight from the local snapshot (datastore.read_columns) and are never
+# kept in the in-process cache; the ETag only needs their versions, which a
+# Name-only preload records.
+
+import hashlib
+
+import pyarrow as pa
+import pyarrow.parquet as pq
+from flask import Response, abort, jsonify, request
+
+import datastore
+import feature_store
+import model_serving
+
+CHUNK_ROWS = 10_000
+FORMATS = {
+    'arrow': 'application/vnd.apache.arrow.stream',
+    'parquet': 'application/vnd.apache.parquet',
+    'csv': 'text/csv',
+}
+
+_served_predictions = datastore.lazy(lambda: model_serving.predictions('2024'))
+
+
+# --- Datasets ---
+
+def datasets():
+    """dataset name -> (loader(columns) -> DataFrame, version())."""
+    out = {}
+    for name in datastore.SOURCES:
+        if name.startswith('pres_election_'):
+            out[name] = (_source_loader(name), _source_version([name]))
+        elif name.startswith('df_'):
+            year = name[len('df_'):]
+            out[f'merged_{year}'] = (_merged_loader(year), _source_version([name] + feature_store.result_sources([year])))
+    for model in model_serving.MODELS:
+        out[f'predictions_{model}'] = (
+            lambda columns, model=model: _project(_served_predictions()[0][model], columns),
+            lambda: _served_predictions()[1],
+        )
+    return out
+
+
+def _project(df, columns):
+    return df if columns is None else df[['Name'] + [c for c in columns if c != 'Name']]
+
+
+def _source_loader(name):
+    return lambda columns: _project(datastore.get(name), columns)
+
+
+def _source_version(names):
+    def version():
+        datastore.preload(names, columns={name: ['Name'] for name in names if name.startswith('df_')})
+        return datastore.version(names)
+    return version
+
+
+def _merged_loader(year):
+    def load(columns):
+        name = f'df_{year}'
+        census_columns = None if columns is None else ['Name'] + [c for c in columns if c not in ('Name', 'Ratio')]
+        census = datastore.read_columns(name, census_columns)
+        ratio = feature_store.election_results(year)[['Name', 'Ratio']]
+        merged = census.merge(ratio, on='Name', how='left')
+        return merged if columns is None or 'Ratio' in columns else merged.drop(columns='Ratio')
+    return load
+
+
+# --- Serialization ---
+
+class _Sink:
+    """Minimal writable file for pyarrow that hands back what was written since the last drain()."""
+
+    closed = False
+
+    def __init__(self):
+        self._parts = []
+        self._position = 0
+
+    def write(self, data):
+        data = bytes(data)
+        self._parts.append(data)
+        self._position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self._position
+
+    def flush(self):
+        pass
+
+    def close(self):
+        self.closed = True
+
+    def drain(self):
+        out = b''.join(self._parts)
+        self._parts = []
+        return out
+
+
+def _chunks(df):
+    for start in range(0, len(df), CHUNK_ROWS):
+        yield df.iloc[start:start + CHUNK_ROWS]
+
+
+def stream(df, fmt):
+    """Generator of the serialized bytes of `df`, one chunk of rows at a time."""
+    if fmt == 'csv':
+        yield df.iloc[:0].to_csv(index=False).encode()
+        for chunk in _chunks(df):
+            yield chunk.to_csv(index=False, header=False).encode()
+        return
+
+    schema = pa.Schema.from_pandas(df, preserve_index=False)
+    sink = _Sink()
+    writer = (pa.ipc.new_stream(sink, schema) if fmt == 'arrow'
+              else pq.ParquetWriter(pa.PythonFile(sink, mode='w'), schema))
+    for chunk in _chunks(df):
+        table = pa.Table.from_pandas(chunk, schema=schema, preserve_index=False)
+        writer.write_table(table)
+        yield sink.drain()
+    writer.close()
+    yield sink.drain()
+
+
+# --- Routes ---
+
+def _index():
+    return jsonify({'datasets': sorted(datasets()), 'formats': sorted(FORMATS)})
+
+
+def _export(dataset, fmt):
+    available = datasets()
+    if dataset not in available or fmt not in FORMATS:
+        abort(404)
+    loader, version = available[dataset]
+    columns = request.args.getlist('column') or None
+    counties = request.args.getlist('county') or None
+
+    key = '|'.join([dataset, version(), fmt, repr(columns), repr(counties)])
+    etag = hashlib.sha1(key.encode()).hexdigest()[:24]
+    if etag in request.if_none_match:
+        return Response(status=304, headers={'ETag': f'"{etag}"'})
+
+    try:
+        df = loader(columns)
+    except (KeyError, ValueError, pa.ArrowInvalid) as exc:
+        return jsonify({'error': f'unknown column: {exc}'}), 400
+    if counties is not None:
+        df = df[df['Name'].isin(counties)]
+
+    headers = {
+        'ETag': f'"{etag}"',
+        'Cache-Control': 'no-cache',
+        'Content-Disposition': f'attachment; filename="{dataset}.{fmt}"',
+    }
+    return Response(stream(df.reset_index(drop=True), fmt), mimetype=FORMATS[fmt], headers=headers)
+
+
+def serve(server):
+    """Add the export routes to a Flask server."""
+    server.add_url_rule('/api/export', 'export_index', _index)
+    server.add_url_rule('/api/export/<dataset>.<fmt>', 'export', _export)
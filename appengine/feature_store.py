@@ -0,0 +1,87 @@
+# feature_store.py
+#
+# Census metrics held as one compact array instead of a wide DataFrame per
+# year.
+#
+# values[year, county, feature] is float32 (NaN where a county or feature is
+# missing for a year). Years, counties and features are addressed by integer
+# position; the *_index dicts map names to positions. Features are keyed by
+# their canonical (2024-style) census column name.
+#
+# build_aligned() reads only the requested columns of each census table, so a
+# worker never parses the hundreds of columns nobody looks at, and lines them
+# up across years whose census tables name columns differently, using the
+# compiled maps in alignment.py.
+
+import numpy as np
+import pandas as pd
+
+import alignment
+import datastore
+
+
+class FeatureStore:
+
+    def __init__(self, years, counties, features, values, ratio):
+        self.years = list(years)
+        self.counties = list(counties)
+        self.features = list(features)
+        self.year_index = {year: i for i, year in enumerate(self.years)}
+        self.county_index = {county: i for i, county in enumerate(self.counties)}
+        self.feature_index = {feature: i for i, feature in enumerate(self.features)}
+        self.values = values      # float32 (year, county, feature)
+        self.ratio = ratio        # float32 (year, county): Dem/Rep vote ratio
+
+    def feature(self, name):
+        """One feature across all years: (year, county) array."""
+        return self.values[:, :, self.feature_index[name]]
+
+    def select(self, names):
+        """Several features, stacked as (feature, year, county)."""
+        return np.moveaxis(self.values[:, :, [self.feature_index[n] for n in names]], -1, 0)
+
+
+def result_sources(years):
+    """The sources election_results() reads for `years`."""
+    sources = []
+    for year in years:
+        name = f'pres_election_{year}'
+        source = name if name in datastore.SOURCES else 'pres_election_history'
+        if source not in sources:
+            sources.append(source)
+    return sources
+
+
+def election_results(year):
+    """Name / Ratio for `year`: its pres_election table, or its rows of the history table for years without one."""
+    name = f'pres_election_{year}'
+    if name in datastore.SOURCES:
+        return datastore.get(name)
+    history = datastore.get('pres_election_history')
+    return history[history['Year'] == int(year)]
+
+
+def build_aligned(years, features=None):
+    """Load the census and election tables for `years` into a FeatureStore of canonical (2024-named) features.
+
+    Each census table is read with only Name and the columns `features`
+    (default: every aligned feature) map to in that year.
+    """
+    aligned = alignment.get()
+    features = aligned.features if features is None else list(features)
+    census_columns = {f'df_{year}': ['Name'] + aligned.projection(year, features) for year in years}
+    datastore.preload(list(census_columns) + result_sources(years), columns=census_columns)
+    census = {year: datastore.get(f'df_{year}', columns=census_columns[f'df_{year}']) for year in years}
+
+    counties = sorted(set().union(*(df['Name'] for df in census.values())))
+    county_pos = pd.Index(counties)
+    values = np.full((len(years), len(counties), len(features)), np.nan, dtype=np.float32)
+    ratio = np.full((len(years), len(counties)), np.nan, dtype=np.float32)
+    for y, year in enumerate(years):
+        df = census[year]
+        values[y, county_pos.get_indexer(df['Name'])] = aligned.gather(year, df, features)
+        result = election_results(year)
+        rows = county_pos.get_indexer(result['Name'])
+        found = rows >= 0
+        ratio[y, rows[found]] = result['Ratio'].to_numpy(dtype=np.float32)[found]
+    return FeatureStore(years, counties, features, values, ratio)
@@ -0,0 +1,70 @@
+# figure_cache.py
+#
+# Memoization for callbacks that build a figure from a handful of input
+# values over static data (e.g. the model toggle on the home page).
+#
+# Figures are stored serialized, keyed on the callback, its inputs and a data
+# version, in an on-disk diskcache store. The store is a SQLite database plus
+# files, so every gunicorn worker on the instance shares it, and it evicts the
+# least recently used figures once it grows past FIGURE_CACHE_SIZE bytes.
+# Hit/miss counters live in the same store and are shared the same way.
+
+import os
+import json
+import functools
+import threading
+
+import diskcache
+
+import datastore
+
+CACHE_DIR = os.environ.get('FIGURE_CACHE_DIR', os.path.join(datastore.CACHE_DIR, 'figures'))
+SIZE_LIMIT = int(os.environ.get('FIGURE_CACHE_SIZE', 64 * 2 ** 20))
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = diskcache.Cache(
+                CACHE_DIR,
+                size_limit=SIZE_LIMIT,
+                eviction_policy='least-recently-used',
+                statistics=True,
+            )
+        return _cache
+
+
+def memoize(version):
+    """Decorator for figure-building callbacks.
+
+    `version` is a zero-argument function returning the current data version;
+    a new version makes every figure built from older data a miss. The
+    wrapped function returns the figure as a plain dict, ready for Dash.
+    """
+    def decorator(build):
+        name = f'{build.__module__}.{build.__qualname__}'
+
+        @functools.wraps(build)
+        def wrapper(*args):
+            cache = get_cache()
+            key = (name, version(), *args)
+            raw = cache.get(key)
+            if raw is None:
+                raw = build(*args).to_json().encode()
+                cache.set(key, raw)
+            return json.loads(raw)
+
+        return wrapper
+    return decorator
+
+
+def stats():
+    """{'hits', 'misses', 'entries', 'bytes'} for the shared figure cache."""
+    cache = get_cache()
+    hits, misses = cache.stats()
+    return {'hits': hits, 'misses': misses, 'entries': len(cache), 'bytes': cache.volume()}
+
@@ -0,0 +1,187 @@
+# geometry.py
+#
+# California county shapes for the maps.
+#
+# The shapes ship with the app in geodata/california-counties.geojson
+# (US Census Bureau cartographic boundary file cb_2016_us_county_500k,
+# California only, coordinates rounded to 5 decimals), so no map needs a
+# network fetch.
+#
+# A county map at the zoom levels we use can't show most of those vertices,
+# so on first use the shapes are simplified at each tolerance in TOLERANCES.
+# Simplification runs on shared borders ("arcs") rather than on each county
+# ring separately: every border between two counties is simplified once and
+# reused by both, so neighbouring counties never end up with gaps or overlaps.
+#
+# Maps ask for counties_geojson(zoom, figure=...) which picks the coarsest
+# level that still stays under half a pixel of error at that zoom, and
+# records how many bytes that saved in payload_report.
+
+import os
+import json
+
+import numpy as np
+
+import datastore
+
+GEOJSON_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'geodata', 'california-counties.geojson')
+
+# Simplification tolerances in degrees; 0 is the full-resolution shapes.
+TOLERANCES = [0, 0.001, 0.005, 0.01, 0.02]
+
+# figure name -> {'tolerance', 'full_bytes', 'bytes', 'saved_bytes'}
+payload_report = {}
+
+
+# --- Topology ---
+
+def _rings(geometry):
+    polygons = geometry['coordinates'] if geometry['type'] == 'MultiPolygon' else [geometry['coordinates']]
+    return [[[tuple(point) for point in ring] for ring in polygon] for polygon in polygons]
+
+
+def _junctions(features):
+    """Points where a ring meets a different neighbour than elsewhere, i.e. where shared borders start or end."""
+    neighbours = {}
+    for polygons in features:
+        for polygon in polygons:
+            for ring in polygon:
+                points = ring[:-1]
+                n = len(points)
+                for i, point in enumerate(points):
+                    pair = frozenset((points[i - 1], points[(i + 1) % n]))
+                    neighbours.setdefault(point, set()).add(pair)
+    return {point for point, pairs in neighbours.items() if len(pairs) > 1}
+
+
+def _split_ring(ring, junctions):
+    """Cut a closed ring into arcs that start and end at junctions."""
+    points = ring[:-1]
+    cuts = [i for i, point in enumerate(points) if point in junctions]
+    if not cuts:
+        # A ring that shares no border (an island): cut it at its first
+        # point and at the point farthest from it so both halves are open.
+        coords = np.asarray(points)
+        far = int(np.argmax(((coords - coords[0]) ** 2).sum(axis=1)))
+        cuts = [0, far] if far else [0]
+    rotated = points[cuts[0]:] + points[:cuts[0]]
+    offsets = [c - cuts[0] for c in cuts] + [len(points)]
+    rotated.append(rotated[0])
+    return [rotated[a:b + 1] for a, b in zip(offsets[:-1], offsets[1:])]
+
+
+# --- Simplification ---
+
+def _douglas_peucker(coords, tolerance):
+    """Indices of the points of `coords` (an (n, 2) array) kept at `tolerance`."""
+    n = len(coords)
+    keep = np.zeros(n, dtype=bool)
+    keep[0] = keep[-1] = True
+    stack = [(0, n - 1)]
+    while stack:
+        first, last = stack.pop()
+        if last - first < 2:
+            continue
+        start, end = coords[first], coords[last]
+        segment = end - start
+        inner = coords[first + 1:last] - start
+        length = np.hypot(*segment)
+        if length == 0:
+            distances = np.hypot(inner[:, 0], inner[:, 1])
+        else:
+            distances = np.abs(segment[0] * inner[:, 1] - segment[1] * inner[:, 0]) / length
+        i = int(np.argmax(distances))
+        if distances[i] > tolerance:
+            split = first + 1 + i
+            keep[split] = True
+            stack.append((first, split))
+            stack.append((split, last))
+    return np.flatnonzero(keep)
+
+
+def _simplify_arc(arc, tolerance, cache):
+    # Shared arcs show up once in each direction; simplify them in one
+    # canonical direction so both counties get exactly the same points.
+    forward = arc[0] <= arc[-1]
+    key = tuple(arc) if forward else tuple(reversed(arc))
+    if key not in cache:
+        coords = np.asarray(key)
+        cache[key] = [key[i] for i in _douglas_peucker(coords, tolerance)]
+    simplified = cache[key]
+    return simplified if forward else simplified[::-1]
+
+
+def simplify(geojson, tolerance):
+    """Return a copy of `geojson` simplified at `tolerance` degrees, keeping shared borders consistent."""
+    if tolerance == 0:
+        return geojson
+    features = [_rings(feature['geometry']) for feature in geojson['features']]
+    junctions = _junctions(features)
+    cache = {}
+    digits = 5 if tolerance < 0.005 else 4
+    out = []
+    for feature, polygons in zip(geojson['features'], features):
+        new_polygons = []
+        for polygon in polygons:
+            new_rings = []
+            for ring in polygon:
+                points = []
+                for arc in _split_ring(ring, junctions):
+                    points.extend(_simplify_arc(arc, tolerance, cache)[:-1])
+                points.append(points[0])
+                rounded = [[round(x, digits), round(y, digits)] for x, y in points]
+                rounded = [p for i, p in enumerate(rounded) if i == 0 or p != rounded[i - 1]]
+                if len(rounded) >= 4:
+                    new_rings.append(rounded)
+                elif not new_rings:
+                    # Exterior ring collapsed: keep the original so the county doesn't vanish.
+                    new_rings.append([list(point) for point in ring])
+            if new_rings:
+                new_polygons.append(new_rings)
+        geometry = (
+            {'type': 'Polygon', 'coordinates': new_polygons[0]} if len(new_polygons) == 1
+            else {'type': 'MultiPolygon', 'coordinates': new_polygons}
+        )
+        out.append({'type': 'Feature', 'properties': feature['properties'], 'geometry': geometry})
+    return {'type': 'FeatureCollection', 'features': out}
+
+
+# --- Public API ---
+
+@datastore.lazy
+def get_levels():
+    """tolerance -> (simplified GeoJSON, serialized size in bytes) for every tolerance in TOLERANCES."""
+    with open(GEOJSON_PATH) as f:
+        full = json.load(f)
+    levels = {}
+    for tolerance in TOLERANCES:
+        geojson = simplify(full, tolerance)
+        levels[tolerance] = (geojson, len(json.dumps(geojson, separators=(',', ':'))))
+    return levels
+
+
+def pick_tolerance(zoom, max_error_pixels=0.5):
+    """Coarsest tolerance whose error stays under `max_error_pixels` on a web map at `zoom`."""
+    degrees_per_pixel = 360 / (256 * 2 ** zoom)
+    usable = [t for t in TOLERANCES if t <= degrees_per_pixel * max_error_pixels]
+    return max(usable)
+
+
+def counties_geojson(zoom=5, figure=None):
+    """County shapes at the right resolution for a map at `zoom`.
+
+    If `figure` is given, the payload size saved against the full-resolution
+    shapes is recorded under that name in payload_report.
+    """
+    levels = get_levels()
+    tolerance = pick_tolerance(zoom)
+    geojson, size = levels[tolerance]
+    if figure is not None:
+        full_size = levels[0][1]
+        payload_report[figure] = {
+            'tolerance': tolerance,
+            'full_bytes': full_size,
+            'bytes': size,
+            'saved_bytes': full_size - size,
+        }
+    return geojson
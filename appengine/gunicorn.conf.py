@@ -0,0 +1,48 @@
+# gunicorn.conf.py
+#
+# Multi-worker serving. The master imports the app (preload_app) and builds
+# every page's datasets and default figures once before forking, so workers
+# start warm and share that memory copy-on-write instead of each downloading
+# and building its own copy. gc.freeze() moves everything built so far out of
+# the collector's reach, so collections in the workers don't write to (and
+# so copy) those pages. Each worker runs a thread pool, so one slow callback
+# doesn't block the others.
+#
+#   gunicorn -c gunicorn.conf.py app:server
+#
+# GUNICORN_WORKERS (or WEB_CONCURRENCY; default: one per core, at most
+# MAX_DEFAULT_WORKERS so a large instance doesn't run out of memory) and
+# GUNICORN_THREADS (default: 4) size the pool; PRELOAD_DATA=0 skips the
+# warm-up in the master. The figure cache and job store (diskcache) reopen
+# their SQLite connections in each worker by themselves.
+
+import gc
+import os
+import sys
+import multiprocessing
+
+bind = ':' + os.environ.get('PORT', '8080')
+preload_app = True
+MAX_DEFAULT_WORKERS = 4
+workers = int(os.environ.get('GUNICORN_WORKERS') or os.environ.get('WEB_CONCURRENCY')
+              or min(multiprocessing.cpu_count(), MAX_DEFAULT_WORKERS))
+worker_class = 'gthread'
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+timeout = 120
+
+
+def when_ready(server):
+    # Runs in the master after the app is imported, before any worker forks.
+    import metrics
+    metrics.reset()
+    if os.environ.get('PRELOAD_DATA', '1') == '1':
+        sys.modules['app'].warm_pages()
+        server.log.info('Preloaded page data in the master')
+    gc.collect()
+    gc.freeze()
+
+
+def worker_exit(server, worker):
+    # Observations made since the worker's last flush would be lost otherwise
+    import metrics
+    metrics._flush(force=True)
@@ -0,0 +1,220 @@
+# ingest.py
+#
+# Builds the pres_election_YYYY.csv tables from the raw Secretary of State
+# result files in electionData/.
+#
+# The raw files come in two layouts:
+#   - wide (csv-candidates-2004/2008/2012.csv): one column per candidate, a
+#     party-code header row, and each county row followed by a "Percent" row
+#     and a blank separator row.
+#   - long (csv-candidates-2016/2020.csv, csv-all-candidates-2024.csv): one
+#     row per county, contest and candidate, with "1,234"-style vote totals
+#     and fused party names such as "Republican,AmericanIndependent".
+#
+# Each raw file is parsed in chunks into per-county Democratic/Republican
+# totals. The totals are cached by the file's content hash, so a run only
+# re-parses files that changed. The cross-year columns (voted_democrat_in_prev,
+# voted_the_same_past_2) are then recomputed from the cached totals, and a
+# pres_election_YYYY.csv is rewritten only if its contents changed. Every
+# year's totals, the first two included, also go to one long
+# pres_election_history.csv for the multi-year map.
+#
+#   python ingest.py [--raw-dir ../electionData] [--out-dir ../electionData]
+
+import os
+import re
+import json
+import hashlib
+import argparse
+import logging
+
+import numpy as np
+import pandas as pd
+
+import datastore
+
+logger = logging.getLogger(__name__)
+
+REPO_DATA_DIR = os.path.join(os.path.dirname(datastore.APP_DIR), 'electionData')
+CACHE_DIR = os.path.join(datastore.CACHE_DIR, 'ingest')
+RAW_PATTERN = re.compile(r'^csv-(?:all-)?candidates-(\d{4})\.csv$')
+CHUNK_SIZE = 50_000
+
+HISTORY_FILE = 'pres_election_history.csv'
+HISTORY_COLUMNS = ['Year', 'Name', 'Democratic Vote Total', 'Republican Vote Total', 'Ratio']
+OUTPUT_COLUMNS = [
+    'Name', 'Democratic Vote Total', 'Republican Vote Total', 'Difference', 'Ratio',
+    'voted_democrat_in_prev', 'voted_the_same_past_2',
+]
+
+
+# --- Parsing ---
+
+def to_votes(values):
+    """'1,234' / ' 56 ' / '' -> int64, for a whole Series at once."""
+    cleaned = values.astype(str).str.replace(r'[,\s]', '', regex=True)
+    return pd.to_numeric(cleaned, errors='coerce').fillna(0).astype(np.int64)
+
+
+def _is_long_layout(path):
+    with open(path, encoding='utf-8-sig') as f:
+        header = f.readline()
+    return header.lower().startswith('election')
+
+
+def long_rows(chunk):
+    """Per-row (Name, dem, rep) votes of the presidential rows in a chunk of a long-layout file."""
+    chunk.columns = [c.strip().upper().replace(' ', '_') for c in chunk.columns]
+    chunk = chunk[(chunk['CONTEST_NAME'].str.strip() == 'President')
+                  & ~chunk['COUNTY_NAME'].str.contains('Total', na=True)]
+    parties = chunk['PARTY_NAME'].fillna('')
+    votes = to_votes(chunk['VOTE_TOTAL'])
+    return pd.DataFrame({
+        'Name': chunk['COUNTY_NAME'].str.strip(),
+        'dem': votes.where(parties.str.contains(r'(?:^|,)\s*Democratic\s*(?:,|$)'), 0),
+        'rep': votes.where(parties.str.contains(r'(?:^|,)\s*Republican\s*(?:,|$)'), 0),
+    })
+
+
+def parse_long(path, chunk_size=CHUNK_SIZE):
+    """Per-county (dem, rep) totals from a one-row-per-candidate results file."""
+    totals = [long_rows(chunk) for chunk in pd.read_csv(path, encoding='utf-8-sig', dtype=str, chunksize=chunk_size)]
+    return pd.concat(totals).groupby('Name', sort=True)[['dem', 'rep']].sum()
+
+
+def parse_wide(path):
+    """Per-county (dem, rep) totals from a one-column-per-candidate results file."""
+    raw = pd.read_csv(path, encoding='utf-8-sig', header=None, dtype=str, skiprows=1)
+    parties = raw.iloc[0].fillna('').str.strip()
+    rows = raw.iloc[1:]
+    names = rows[0].fillna('')
+    # Keep county rows: drop the Percent rows (indented), blank separators and totals
+    rows = rows[(names.str.strip() != '') & ~names.str.startswith(' ') & ~names.str.contains('Total')]
+    dem = parties[parties == 'DEM'].index[0]
+    rep = parties[parties == 'REP'].index[0]
+    return pd.DataFrame({
+        'Name': rows[0].str.strip(),
+        'dem': to_votes(rows[dem]).to_numpy(),
+        'rep': to_votes(rows[rep]).to_numpy(),
+    }).groupby('Name', sort=True)[['dem', 'rep']].sum()
+
+
+def parse(path):
+    return parse_long(path) if _is_long_layout(path) else parse_wide(path)
+
+
+# --- Derived tables ---
+
+def build_tables(totals):
+    """year -> pres_election DataFrame, from year -> (dem, rep) totals.
+
+    A year gets a table only if the two elections before it are available,
+    since voted_democrat_in_prev / voted_the_same_past_2 need them.
+    """
+    years = sorted(totals)
+    dem_won = {year: totals[year]['dem'] > totals[year]['rep'] for year in years}
+    tables = {}
+    for i, year in enumerate(years):
+        if i < 2:
+            continue
+        prev, prev2 = dem_won[years[i - 1]], dem_won[years[i - 2]]
+        t = totals[year]
+        df = pd.DataFrame({
+            'Name': t.index,
+            'Democratic Vote Total': t['dem'].to_numpy(),
+            'Republican Vote Total': t['rep'].to_numpy(),
+        })
+        df['Difference'] = (df['Democratic Vote Total'] - df['Republican Vote Total']).abs()
+        df['Ratio'] = df['Democratic Vote Total'] / df['Republican Vote Total']
+        df['voted_democrat_in_prev'] = prev.reindex(df['Name']).fillna(False).astype(int).to_numpy()
+        df['voted_the_same_past_2'] = (prev.reindex(df['Name']) == prev2.reindex(df['Name'])).astype(int).to_numpy()
+        tables[year] = df[OUTPUT_COLUMNS]
+    return tables
+
+
+def build_history(totals):
+    """One row per (year, county) with the two parties' totals and Ratio, for every year."""
+    frames = []
+    for year in sorted(totals):
+        t = totals[year]
+        frames.append(pd.DataFrame({
+            'Year': int(year),
+            'Name': t.index,
+            'Democratic Vote Total': t['dem'].to_numpy(),
+            'Republican Vote Total': t['rep'].to_numpy(),
+        }))
+    df = pd.concat(frames, ignore_index=True)
+    df['Ratio'] = df['Democratic Vote Total'] / df['Republican Vote Total']
+    return df[HISTORY_COLUMNS]
+
+
+# --- Incremental run ---
+
+def _file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def raw_files(raw_dir):
+    """year -> path of every raw results file in `raw_dir`."""
+    files = {}
+    for name in sorted(os.listdir(raw_dir)):
+        match = RAW_PATTERN.match(name)
+        if match:
+            files[match.group(1)] = os.path.join(raw_dir, name)
+    return files
+
+
+def load_totals(raw_dir, cache_dir=CACHE_DIR):
+    """year -> (dem, rep) totals, re-parsing only raw files whose content changed.
+
+    Returns (totals, parsed_years).
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    totals, parsed = {}, []
+    for year, path in raw_files(raw_dir).items():
+        cached = os.path.join(cache_dir, f'totals_{year}.{_file_hash(path)[:16]}.feather')
+        if os.path.exists(cached):
+            totals[year] = pd.read_feather(cached).set_index('Name')
+            continue
+        logger.info('parsing %s', path)
+        totals[year] = parse(path)
+        totals[year].reset_index().to_feather(cached)
+        parsed.append(year)
+    return totals, parsed
+
+
+def run(raw_dir=REPO_DATA_DIR, out_dir=REPO_DATA_DIR, cache_dir=CACHE_DIR):
+    """Bring every output table in `out_dir` up to date. Returns the files rewritten."""
+    totals, parsed = load_totals(raw_dir, cache_dir)
+    outputs = {f'pres_election_{year}.csv': df for year, df in build_tables(totals).items()}
+    outputs[HISTORY_FILE] = build_history(totals)
+    written = []
+    for file_name, df in outputs.items():
+        path = os.path.join(out_dir, file_name)
+        if os.path.exists(path) and _tables_equal(pd.read_csv(path), df):
+            continue
+        df.to_csv(path, index=False)
+        written.append(file_name)
+    logger.info('parsed %s, wrote %s', parsed or 'nothing', written or 'nothing')
+    return written
+
+
+def _tables_equal(a, b):
+    if list(a.columns) != list(b.columns) or len(a) != len(b):
+        return False
+    numeric = a.columns.drop('Name')
+    return (a['Name'].tolist() == b['Name'].tolist()
+            and np.allclose(a[numeric].to_numpy(float), b[numeric].to_numpy(float), equal_nan=True))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build pres_election_YYYY.csv from the raw result files.')
+    parser.add_argument('--raw-dir', default=REPO_DATA_DIR)
+    parser.add_argument('--out-dir', default=REPO_DATA_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    print(json.dumps(run(args.raw_dir, args.out_dir)))
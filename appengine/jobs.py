@@ -0,0 +1,148 @@
+# jobs.py
+#
+# Background execution for heavy callbacks.
+#
+# A callback declared with background=True and manager=jobs.manager(...) is a
+# Dash background callback: it runs in a child process instead of on the
+# gunicorn thread that received it, and the browser polls for its progress
+# and result, so interactive callbacks keep being served in the meantime.
+# Jobs, progress and results live in one diskcache store (JOBS_CACHE_DIR)
+# shared by every worker on the instance.
+#
+# On top of Dash's DiskcacheManager:
+#   - result reuse: a job whose key (callback source, arguments and the
+#     manager's data version) already has a stored result is answered from
+#     the store without starting a process. Results expire JOB_RESULT_TTL
+#     seconds after they were last used; errors are never reused.
+#   - deduplication: a request for a job that is already running watches
+#     that process instead of starting another one.
+#   - cancellation: a shared job is only killed once every browser watching it
+#     has cancelled it (or moved on to other inputs).
+#   - a pool of JOB_WORKERS slots: further jobs wait for a free slot, and jobs
+#     run at a lower CPU priority (nice JOB_NICE) than the web workers.
+#
+# Needs the dash[diskcache] extras (multiprocess, psutil).
+
+import os
+import time
+import threading
+import contextlib
+
+import diskcache
+import psutil
+from dash import DiskcacheManager
+
+import datastore
+
+JOBS_DIR = os.environ.get('JOBS_CACHE_DIR', os.path.join(datastore.CACHE_DIR, 'jobs'))
+JOB_WORKERS = int(os.environ.get('JOB_WORKERS', 1))
+JOB_NICE = int(os.environ.get('JOB_NICE', 10))
+JOB_RESULT_TTL = int(os.environ.get('JOB_RESULT_TTL', 24 * 3600))
+SLOT_POLL_SECONDS = 0.2
+
+STORED = -1            # job id handed out for a result answered from the store
+SLOTS_KEY = 'job-slots'
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = diskcache.Cache(JOBS_DIR)
+        return _store
+
+
+def _job_key(key):
+    return f'{key}-job'
+
+
+def _watchers_key(job):
+    return f'job-{job}-watchers'
+
+
+def _alive(pid):
+    try:
+        return psutil.Process(pid).status() != psutil.STATUS_ZOMBIE
+    except psutil.NoSuchProcess:
+        return False
+
+
+def _reusable(result):
+    return result is not None and not (isinstance(result, dict) and 'long_callback_error' in result)
+
+
+@contextlib.contextmanager
+def _slot(store):
+    """Hold one of the JOB_WORKERS slots shared by every process on the instance."""
+    pid = os.getpid()
+    while True:
+        with store.transact():
+            # Slots of killed jobs are reclaimed here
+            running = [p for p in store.get(SLOTS_KEY, []) if _alive(p)]
+            if len(running) < JOB_WORKERS:
+                store.set(SLOTS_KEY, running + [pid])
+                break
+        time.sleep(SLOT_POLL_SECONDS)
+    try:
+        yield
+    finally:
+        with store.transact():
+            store.set(SLOTS_KEY, [p for p in store.get(SLOTS_KEY, []) if p != pid])
+
+
+class JobManager(DiskcacheManager):
+    """DiskcacheManager with result reuse, in-flight deduplication and a bounded process pool."""
+
+    def make_job_fn(self, fn, progress, key=None):
+        job_fn = super().make_job_fn(fn, progress, key)
+        store = self.handle
+
+        def run(result_key, progress_key, args, context):
+            os.nice(JOB_NICE)
+            with _slot(store):
+                job_fn(result_key, progress_key, args, context)
+            store.delete(_job_key(result_key))
+
+        return run
+
+    def call_job_fn(self, key, job_fn, args, context):
+        with self.handle.transact():
+            if _reusable(self.handle.get(key)):
+                return STORED
+            job = self.handle.get(_job_key(key))
+            if job is not None and self.job_running(job):
+                self.handle.incr(_watchers_key(job))
+                return job
+        job = super().call_job_fn(key, job_fn, args, context)
+        with self.handle.transact():
+            self.handle.set(_job_key(key), job)
+            self.handle.set(_watchers_key(job), 1)
+        return job
+
+    def terminate_job(self, job):
+        if job is None or int(job) == STORED:
+            return
+        job = int(job)
+        with self.handle.transact():
+            watchers = self.handle.incr(_watchers_key(job), -1, default=1)
+            if watchers > 0:
+                return
+            self.handle.delete(_watchers_key(job))
+        super().terminate_job(job)
+
+    def job_running(self, job):
+        if job is None or int(job) == STORED:
+            return False
+        return _alive(int(job))
+
+    def get_progress(self, key):
+        # Left in place for the other browsers watching the same job; get_result clears it
+        return self.handle.get(self._make_progress_key(key))
+
+
+def manager(version):
+    """A background callback manager whose stored results are keyed on `version()` as well as the arguments."""
+    return JobManager(get_store(), cache_by=[version], expire=JOB_RESULT_TTL)
@@ -0,0 +1,143 @@
+# live.py
+#
+# Election-night live results.
+#
+# On election night the Secretary of State republishes csv-all-candidates-2024.csv
+# every few minutes. With LIVE_RESULTS_DIR set, the home page follows a copy of
+# that file in a local drop directory (whatever mirrors the feed should replace
+# the file atomically: write a temporary file, then rename it):
+#   - poll() stats the file; when it changed, its lines are diffed against the
+#     previous snapshot as a multiset, so only added and removed rows are
+#     parsed (ingest.long_rows). Removed rows are subtracted from the
+#     per-county totals, added rows added, and Ratio/Party follow for the
+#     counties they touch.
+#   - every ingest is logged under the file's mtime, which is its version.
+#     changes_since(v) gives the current results of every county changed after
+#     v; the home page asks for it on a dcc.Interval and patches only those
+#     counties into its maps.
+#   - metrics.live_ingest_seconds times file written -> applied in memory and
+#     metrics.live_screen_seconds file written -> update acknowledged by a
+#     browser (on the server's clock, so it includes the acknowledgment's trip
+#     back).
+#
+# Each worker process follows the file on its own. Versions are mtimes rather
+# than counters, so a browser whose requests land on different workers still
+# gets every change.
+
+import io
+import os
+import time
+import threading
+import collections
+
+import numpy as np
+import pandas as pd
+
+import datastore
+import ingest
+import metrics
+
+LIVE_DIR = os.environ.get('LIVE_RESULTS_DIR')
+ENABLED = bool(LIVE_DIR)
+LIVE_FILE = 'csv-all-candidates-2024.csv'
+INTERVAL_MS = int(os.environ.get('LIVE_INTERVAL_MS', '2000'))
+LOG_SIZE = 1000
+RESULT_COLUMNS = ['Democratic Vote Total', 'Republican Vote Total', 'Ratio', 'Party']
+
+
+def _totals(header, rows):
+    """Per-county (dem, rep) totals of a multiset of raw CSV lines."""
+    if not rows:
+        return pd.DataFrame(columns=['dem', 'rep'], dtype=np.int64)
+    text = '\n'.join([header] + list(rows.elements()))
+    parsed = ingest.long_rows(pd.read_csv(io.StringIO(text), dtype=str))
+    return parsed.groupby('Name')[['dem', 'rep']].sum()
+
+
+class LiveResults:
+    """Per-county totals of a long-layout results file that is republished in place."""
+
+    def __init__(self, path):
+        self.path = path
+        self.header = None
+        self.lines = collections.Counter()
+        self.totals = pd.DataFrame(columns=['dem', 'rep'], dtype=np.int64)
+        self.version = 0.0
+        self.log = collections.deque(maxlen=LOG_SIZE)   # (version, counties changed)
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def poll(self):
+        """Ingest the file if it changed since the last poll. Returns the counties whose totals changed."""
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            return []
+        key = (stat.st_mtime_ns, stat.st_size)
+        if key == self._stat:
+            return []
+        with self._lock:
+            if key == self._stat:
+                return []
+            with open(self.path, encoding='utf-8-sig') as f:
+                header, *rows = f.read().splitlines() or ['']
+            counties = self._apply(header, collections.Counter(r for r in rows if r.strip()), stat.st_mtime)
+            self._stat = key
+        metrics.live_ingest_seconds.observe(LIVE_FILE, max(time.time() - stat.st_mtime, 0))
+        return counties
+
+    def _apply(self, header, rows, version):
+        if header != self.header:
+            # New layout: start over from this snapshot
+            self.header, self.lines = header, collections.Counter()
+            self.totals = self.totals.iloc[:0]
+        added, removed = rows - self.lines, self.lines - rows
+        delta = _totals(header, added).sub(_totals(header, removed), fill_value=0)
+        delta = delta[(delta != 0).any(axis=1)]
+        self.totals = self.totals.add(delta, fill_value=0).astype(np.int64)
+        self.lines = rows
+        self.version = version
+        counties = delta.index.tolist()
+        if counties:
+            self.log.append((version, counties))
+        return counties
+
+    def table(self, counties=None):
+        """Current results per county (indexed by Name), like the pres_election table."""
+        totals = self.totals if counties is None else self.totals.loc[counties]
+        df = pd.DataFrame({
+            'Democratic Vote Total': totals['dem'],
+            'Republican Vote Total': totals['rep'],
+        })
+        df['Ratio'] = df['Democratic Vote Total'] / df['Republican Vote Total']
+        df['Party'] = np.where(df['Ratio'] >= 1, 'dem', 'rep')
+        return df
+
+    def changes_since(self, version):
+        """(current version, table() of the counties changed after `version`)."""
+        with self._lock:
+            if len(self.log) == self.log.maxlen and version < self.log[0][0]:
+                # Older entries were dropped: send everything
+                return self.version, self.table()
+            counties = sorted({c for v, changed in self.log if v > version for c in changed})
+            return self.version, self.table(counties)
+
+    def overlay(self, results):
+        """`results` (a pres_election table) with the live counts in place for the counties reported."""
+        with self._lock:
+            current = self.table()
+        df = results.set_index('Name')
+        reported = current.index.intersection(df.index)
+        df.loc[reported, RESULT_COLUMNS] = current.loc[reported, RESULT_COLUMNS]
+        return df.reset_index()
+
+
+@datastore.lazy
+def get():
+    """The LiveResults for the drop directory."""
+    return LiveResults(os.path.join(LIVE_DIR, LIVE_FILE))
+
+
+def acknowledge(version):
+    """Record that a browser shows the results of `version`."""
+    metrics.live_screen_seconds.observe(LIVE_FILE, max(time.time() - version, 0))
@@ -0,0 +1,70 @@
+# metric_labels.py
+#
+# Readable labels for census columns that appear on the pages.
+#
+# The two mappings are the metrics found in the original analysis to be most
+# positively / negatively correlated with the Dem/Rep vote ratio. The
+# findings dropdowns list whatever correlation.top_k() returns and use these
+# for nicer labels and keys (label(), key()); other pages use label() for any
+# census column.
+
+import correlation
+
+column_mapping_positive = {
+    'graduate': {
+        'col': 'Estimate!!Native!!EDUCATIONAL ATTAINMENT!!Population 25 years and over!!Graduate or professional degree',
+        'label': "Graduate Degree (%)"
+    },
+    'industry': {
+        'col': 'Estimate!!Native!!Civilian employed population 16 years and over!!INDUSTRY!!Professional, scientific, and management, and administrative and waste management services',
+        'label': "Professional/Scientific Employment (%)"
+    },
+    'high_income': {
+        'col': 'Estimate!!Native!!EARNINGS IN THE PAST 12 MONTHS (IN 2023 INFLATION-ADJUSTED DOLLARS) FOR FULL-TIME, YEAR-ROUND WORKERS!!Population 16 years and over with earnings!!$75,000 or more',
+        'label': "High Income ($75k+) (%)"
+    },
+    'foreign_rooms': {
+        'col': 'Estimate!!Foreign-born!!Occupied housing units!!ROOMS!!2 or 3 rooms',
+        'label': "Foreign-born Households (2–3 Rooms) (%)"
+    },
+    'total_rooms': {
+        'col': 'Estimate!!Total!!Occupied housing units!!ROOMS!!2 or 3 rooms',
+        'label': "All Households (2–3 Rooms) (%)"
+    }
+}
+column_mapping_negative = {
+    'some_college': {
+        'col': "Estimate!!Native!!EDUCATIONAL ATTAINMENT!!Population 25 years and over!!Some college or associate's degree",
+        'label': "Some College or Associate's Degree (%)"
+    },
+    'low_income': {
+        'col': 'Estimate!!Native!!EARNINGS IN THE PAST 12 MONTHS (IN 2023 INFLATION-ADJUSTED DOLLARS) FOR FULL-TIME, YEAR-ROUND WORKERS!!Population 16 years and over with earnings!!$35,000 to $49,999',
+        'label': "Low Income ($35k–$50k) (%)"
+    },
+    'retail_trade': {
+        'col': 'Estimate!!Native!!Civilian employed population 16 years and over!!INDUSTRY!!Retail trade',
+        'label': "Retail Trade Employment (%)"
+    },
+    'married_poverty': {
+        'col': 'Estimate!!Native!!POVERTY STATUS IN THE PAST 12 MONTHS!!POVERTY RATES FOR FAMILIES FOR WHOM POVERTY STATUS IS DETERMINED!!Married-couple family',
+        'label': "Married Couples in Poverty (%)"
+    },
+    'six_seven_rooms': {
+        'col': 'Estimate!!Total!!Occupied housing units!!ROOMS!!6 or 7 rooms',
+        'label': "Households with 6–7 Rooms (%)"
+    }
+}
+
+
+_curated = {**column_mapping_positive, **column_mapping_negative}
+_labels = {v['col']: v['label'] for v in _curated.values()}
+_keys = {v['col']: k for k, v in _curated.items()}
+
+
+def label(col):
+    return _labels.get(col) or correlation.describe(col)
+
+
+def key(col):
+    """The curated key of a census column (either sign), or the column name itself."""
+    return _keys.get(col, col)
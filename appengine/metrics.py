@@ -0,0 +1,220 @@
+# metrics.py
+#
+# Runtime instrumentation for the Flask server behind the Dash app, exposed
+# in the Prometheus text format on /metrics.
+#
+# Recorded per request, in after_request hooks (a couple of dict lookups and
+# a lock per request, cheap enough to leave on):
+#   dash_callback_seconds / dash_callback_response_bytes
+#       histograms per callback, labelled by its output
+#       (/_dash-update-component requests)
+#   http_request_seconds / http_response_bytes
+#       histograms per Flask route for everything else
+# Recorded by live.py in live-results mode:
+#   live_ingest_seconds         results file written -> counts applied in memory
+#   live_screen_seconds         results file written -> update acknowledged by a browser
+# Read from the other modules when /metrics is scraped:
+#   data_load_seconds           per datastore source, from datastore.load_report
+#   figure_cache_*              hits / misses / entries / bytes of the figure cache
+#
+# Set SERVER_TIMING=1 to add a Server-Timing header with the server-side
+# duration to every response.
+#
+# Gunicorn runs several worker processes and a scrape reaches only one of
+# them, so each worker writes its histograms to <pid>.json in METRICS_DIR
+# (once per FLUSH_SECONDS at most, and within FLUSH_SECONDS of a new
+# observation) and /metrics adds up the files of every worker, including ones
+# that have since exited, so counts never go backwards. reset() clears the
+# directory when the server starts.
+
+import os
+import json
+import time
+import bisect
+import threading
+
+from flask import Response, g, request
+
+import datastore
+import figure_cache
+
+SERVER_TIMING = os.environ.get('SERVER_TIMING', '0') == '1'
+METRICS_DIR = os.environ.get('METRICS_DIR', os.path.join(datastore.CACHE_DIR, 'metrics'))
+FLUSH_SECONDS = 1.0
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+SIZE_BUCKETS = (1e3, 1e4, 5e4, 1e5, 2.5e5, 5e5, 1e6, 2.5e6, 5e6)
+LIVE_BUCKETS = (0.1, 0.25, 0.5, 1, 2, 5, 10, 30, 60, 120)
+
+
+class Histogram:
+    """Cumulative-bucket histogram keyed by one label value."""
+
+    def __init__(self, name, help_text, label, buckets):
+        self.name = name
+        self.help_text = help_text
+        self.label = label
+        self.buckets = buckets
+        self._series = {}  # label value -> [bucket counts..., +Inf count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, label_value, value):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(label_value)
+            if series is None:
+                series = self._series[label_value] = [0] * (len(self.buckets) + 2)
+            series[i] += 1
+            series[-1] += value
+
+    def snapshot(self):
+        with self._lock:
+            return {k: list(v) for k, v in self._series.items()}
+
+    def render(self, series):
+        """Exposition lines for `series` (label value -> counts, as kept by observe())."""
+        lines = [f'# HELP {self.name} {self.help_text}', f'# TYPE {self.name} histogram']
+        for label_value, counts in sorted(series.items()):
+            label = f'{self.label}="{_escape(label_value)}"'
+            total = 0
+            for bound, count in zip(self.buckets + ('+Inf',), counts):
+                total += count
+                lines.append(f'{self.name}_bucket{{{label},le="{bound}"}} {total}')
+            lines.append(f'{self.name}_sum{{{label}}} {counts[-1]}')
+            lines.append(f'{self.name}_count{{{label}}} {total}')
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', r'\\').replace('"', r'\"').replace('\n', r'\n')
+
+
+callback_seconds = Histogram('dash_callback_seconds', 'Dash callback latency.', 'output', LATENCY_BUCKETS)
+callback_bytes = Histogram('dash_callback_response_bytes', 'Dash callback response size.', 'output', SIZE_BUCKETS)
+request_seconds = Histogram('http_request_seconds', 'HTTP request latency.', 'route', LATENCY_BUCKETS)
+response_bytes = Histogram('http_response_bytes', 'HTTP response size.', 'route', SIZE_BUCKETS)
+live_ingest_seconds = Histogram('live_ingest_seconds', 'Live results file written to applied.', 'file', LIVE_BUCKETS)
+live_screen_seconds = Histogram('live_screen_seconds', 'Live results file written to shown in a browser.', 'file',
+                                LIVE_BUCKETS)
+HISTOGRAMS = (callback_seconds, callback_bytes, request_seconds, response_bytes,
+              live_ingest_seconds, live_screen_seconds)
+
+
+# --- Sharing across worker processes ---
+
+_last_flush = 0.0
+_pending = None
+_flush_lock = threading.Lock()
+
+
+def _flush(force=False):
+    """Write this process's histograms to its file in METRICS_DIR.
+
+    Within FLUSH_SECONDS of the last write a timer does it instead, so what a
+    scrape sees is never more than FLUSH_SECONDS behind.
+    """
+    global _last_flush, _pending
+    with _flush_lock:
+        wait = _last_flush + FLUSH_SECONDS - time.monotonic()
+        if not force and wait > 0:
+            if _pending is None:
+                _pending = threading.Timer(wait, _flush, kwargs={'force': True})
+                _pending.daemon = True
+                _pending.start()
+            return
+        if _pending is not None:
+            _pending.cancel()
+            _pending = None
+        os.makedirs(METRICS_DIR, exist_ok=True)
+        path = os.path.join(METRICS_DIR, f'{os.getpid()}.json')
+        with open(path + '.tmp', 'w') as f:
+            json.dump({h.name: h.snapshot() for h in HISTOGRAMS}, f)
+        os.replace(path + '.tmp', path)
+        _last_flush = time.monotonic()
+
+
+def _merged():
+    """histogram name -> series summed over every worker's file."""
+    _flush(force=True)
+    merged = {h.name: {} for h in HISTOGRAMS}
+    for entry in os.scandir(METRICS_DIR):
+        if not entry.name.endswith('.json'):
+            continue
+        try:
+            with open(entry.path) as f:
+                worker = json.load(f)
+        except (OSError, ValueError):
+            continue
+        for name, series in worker.items():
+            totals = merged.get(name)
+            if totals is None:
+                continue
+            for label_value, counts in series.items():
+                current = totals.get(label_value)
+                totals[label_value] = counts if current is None else [a + b for a, b in zip(current, counts)]
+    return merged
+
+
+def reset():
+    """Drop the files left by earlier runs. Call once before the workers start."""
+    if os.path.isdir(METRICS_DIR):
+        for entry in os.scandir(METRICS_DIR):
+            os.remove(entry.path)
+
+
+# --- Flask hooks ---
+
+def _before_request():
+    g.metrics_start = time.perf_counter()
+
+
+def _after_request(response):
+    start = g.pop('metrics_start', None)
+    if start is None:
+        return response
+    seconds = time.perf_counter() - start
+    size = response.calculate_content_length() or 0
+    if request.path.endswith('/_dash-update-component'):
+        body = request.get_json(silent=True) or {}
+        output = body.get('output', 'unknown')
+        callback_seconds.observe(output, seconds)
+        callback_bytes.observe(output, size)
+    elif request.path != '/metrics':
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        request_seconds.observe(route, seconds)
+        response_bytes.observe(route, size)
+    if SERVER_TIMING:
+        response.headers['Server-Timing'] = f'app;dur={seconds * 1000:.1f}'
+    _flush()
+    return response
+
+
+def render():
+    """Every metric in the Prometheus text exposition format."""
+    lines = []
+    merged = _merged()
+    for histogram in HISTOGRAMS:
+        lines += histogram.render(merged[histogram.name])
+
+    lines += ['# HELP data_load_seconds Duration of the last load of each data source.',
+              '# TYPE data_load_seconds gauge']
+    for name, entry in sorted(datastore.load_report.items()):
+        if entry:
+            lines.append(f'data_load_seconds{{source="{name}",origin="{entry["origin"]}"}} {entry["seconds"]}')
+
+    stats = figure_cache.stats()
+    for key, kind, help_text in (
+        ('hits', 'counter', 'Figure cache hits.'),
+        ('misses', 'counter', 'Figure cache misses.'),
+        ('entries', 'gauge', 'Figures in the cache.'),
+        ('bytes', 'gauge', 'Size of the figure cache.'),
+    ):
+        name = f'figure_cache_{key}_total' if kind == 'counter' else f'figure_cache_{key}'
+        lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}', f'{name} {stats[key]}']
+    return '\n'.join(lines) + '\n'
+
+
+def instrument(server):
+    """Add the timing hooks and the /metrics route to a Flask server."""
+    server.before_request(_before_request)
+    server.after_request(_after_request)
+    server.add_url_rule('/metrics', 'metrics', lambda: Response(render(), mimetype='text/plain; version=0.0.4'))
@@ -0,0 +1,114 @@
+# model_serving.py
+#
+# Runs the trained MLP / Random Forest / Gradient Boosting models in-process
+# instead of reading their frozen 2024_prediction_*.csv output.
+#
+# Artifacts live in MODEL_DIR (written by training.py):
+#   manifest.json   {"version", "year", "target", "census_features",
+#                    "election_features", "models": {"MLP": "mlp.joblib", ...}}
+#   <model>.joblib  a fitted scikit-learn estimator / pipeline
+#
+# Each model is unpickled on first use and kept until its file changes. One
+# predict() call scores all 58 counties at once. Missing census values are
+# filled by fill_missing(), the same way training.py fills them before
+# fitting. If there are no artifacts,
+# or the census inputs can't be loaded, predictions() falls back to the
+# static CSVs through the datastore so the home page always has something to
+# show.
+
+import os
+import json
+import logging
+import threading
+
+import numpy as np
+import pandas as pd
+
+import datastore
+import feature_store
+
+logger = logging.getLogger(__name__)
+
+MODEL_DIR = os.environ.get('MODEL_DIR', os.path.join(datastore.APP_DIR, 'models'))
+MODELS = ('MLP', 'RF', 'GB')
+
+# path -> (mtime_ns, estimator)
+_artifacts = {}
+_artifacts_lock = threading.Lock()
+
+
+def read_manifest(model_dir=None):
+    path = os.path.join(model_dir or MODEL_DIR, 'manifest.json')
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def load_model(file_name, model_dir=None):
+    """Unpickle a model artifact, reusing the cached copy while the file is unchanged."""
+    import joblib
+
+    path = os.path.join(model_dir or MODEL_DIR, file_name)
+    mtime = os.stat(path).st_mtime_ns
+    with _artifacts_lock:
+        cached = _artifacts.get(path)
+        if cached is None or cached[0] != mtime:
+            cached = (mtime, joblib.load(path))
+            _artifacts[path] = cached
+        return cached[1]
+
+
+def feature_matrix(manifest, year=None):
+    """(county names, X) for `year` with the columns the models were trained on."""
+    year = year or manifest['year']
+    store = feature_store.build_aligned([year], manifest['census_features'])
+    census = store.values[0]                                   # (county, feature)
+    election = datastore.get(f'pres_election_{year}').set_index('Name')
+    election = election.reindex(store.counties)[manifest['election_features']].to_numpy(dtype=np.float32)
+    return store.counties, np.hstack([census, election])
+
+
+def fill_missing(X):
+    """Model input with missing values filled; used for training and inference alike."""
+    return np.nan_to_num(X)
+
+
+def predict(X, manifest, models=MODELS, model_dir=None):
+    """model name -> predicted ratios for every row of X, one batched call per model."""
+    X = fill_missing(X)
+    out = {}
+    for name in models:
+        y = np.asarray(load_model(manifest['models'][name], model_dir).predict(X), dtype=float)
+        out[name] = np.exp(y) if manifest.get('target') == 'log_ratio' else y
+    return out
+
+
+def _prediction_frame(names, predicted, actual):
+    df = pd.DataFrame({'Name': names, 'Predicted_Ratio': predicted})
+    df['Ratio'] = actual.reindex(df['Name']).to_numpy()
+    df['Error'] = df['Ratio'] - df['Predicted_Ratio']
+    return df
+
+
+def predictions(year=None):
+    """model name -> DataFrame(Name, Predicted_Ratio, Ratio, Error), the same schema as the CSVs.
+
+    Also returns the version string of what was served:
+    (frames, version).
+    """
+    manifest = read_manifest()
+    if manifest is not None:
+        try:
+            year = year or manifest['year']
+            names, X = feature_matrix(manifest, year)
+            predicted = predict(X, manifest)
+            actual = datastore.get(f'pres_election_{year}').set_index('Name')['Ratio']
+            frames = {name: _prediction_frame(names, predicted[name], actual) for name in MODELS}
+            sources = [f'df_{year}', f'pres_election_{year}']
+            return frames, f"models-{manifest['version']}-{datastore.version(sources)}"
+        except Exception:
+            logger.exception('Model inference failed, serving the static prediction CSVs')
+    frames = datastore.get_predictions()
+    return frames, 'csv-' + datastore.version([f'prediction_{name}' for name in MODELS])
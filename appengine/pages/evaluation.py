@@ -0,0 +1,112 @@
+# pages/evaluation.py
+
+import plotly.graph_objects as go
+import dash_bootstrap_components as dbc
+from dash import html, dcc, register_page
+
+import datastore
+import evaluation
+import model_serving
+
+register_page(__name__, path="/evaluation", name="Model Evaluation")
+
+MODEL_NAMES = {'MLP': 'Multi-Layer Perceptron', 'RF': 'Random Forest', 'GB': 'Gradient Boosting'}
+WORST = 10
+
+
+# --- Scores (computed on first use) ---
+@datastore.lazy
+def get_data():
+    datastore.preload(['pres_election_2024'])
+    frames, version = model_serving.predictions('2024')
+    table = evaluation.get(frames, version)
+
+    errors = {model: df.set_index('Name')['Error'] for model, df in frames.items()}
+    worst = (
+        datastore.get('pres_election_2024').set_index('Name')[['Ratio']]
+        .join([errors[m].rename(f'{m} Error') for m in errors])
+    )
+    worst['Mean |Error|'] = worst[[f'{m} Error' for m in errors]].abs().mean(axis=1)
+    worst = worst.sort_values('Mean |Error|', ascending=False).head(WORST).reset_index()
+
+    return {
+        'table': table,
+        'worst': worst,
+        'repeated': evaluation.repeated_predictions(frames),
+    }
+
+
+def interval_figure(table, metrics, title, yaxis_title):
+    fig = go.Figure()
+    for metric in metrics:
+        fig.add_trace(go.Bar(
+            x=[MODEL_NAMES.get(m, m) for m in table.index],
+            y=table[metric],
+            name=metric,
+            error_y=dict(
+                type='data',
+                symmetric=False,
+                array=table[f'{metric}_high'] - table[metric],
+                arrayminus=table[metric] - table[f'{metric}_low'],
+            ),
+        ))
+    fig.update_layout(title=title, yaxis_title=yaxis_title, barmode='group', template='plotly_white')
+    return fig
+
+
+def scores_table(table):
+    rows = []
+    for model, row in table.iterrows():
+        cells = [html.Td(MODEL_NAMES.get(model, model))]
+        for metric in evaluation.METRICS:
+            scale, fmt = (100, '{:.1f}%') if metric == 'Accuracy' else (1, '{:.3f}')
+            cells.append(html.Td(
+                f"{fmt.format(row[metric] * scale)} "
+                f"({fmt.format(row[f'{metric}_low'] * scale)} – {fmt.format(row[f'{metric}_high'] * scale)})"
+            ))
+        rows.append(html.Tr(cells))
+    header = html.Thead(html.Tr([html.Th("Model")] + [html.Th(m) for m in evaluation.METRICS]))
+    return dbc.Table([header, html.Tbody(rows)], striped=True, bordered=True, hover=True)
+
+
+def repeated_list(repeated):
+    items = [
+        html.Li(f"{MODEL_NAMES.get(model, model)} predicts {value:.3f} for {len(names)} counties: {', '.join(names)}")
+        for model, groups in repeated.items()
+        for value, names in groups.items()
+    ]
+    return html.Ul(items) if items else html.P("No model gives the same prediction to more than one county.")
+
+
+# --- Layout ---
+def layout():
+    data = get_data()
+    table = data['table']
+    return html.Div([
+        html.H1("Model Evaluation", style={"textAlign": "center"}),
+        html.P(
+            f"""
+            How well each model's 2024 predictions match the actual county results. Ranges are
+            {evaluation.CONFIDENCE:.0%} bootstrap confidence intervals over {evaluation.RESAMPLES:,} resamples of
+            the counties. Vote-weighted MAE weighs each county by its two-party vote total, so large counties
+            count for more.
+            """,
+            style={"textAlign": "center", "fontSize": "16px"}),
+
+        html.Div(scores_table(table), style={"width": "90%", "margin": "auto"}),
+
+        html.Div([
+            dcc.Graph(figure=interval_figure(table, ['MAE', 'RMSE', 'Weighted MAE'],
+                                             "Ratio Error by Model", "Error (Dem/Rep ratio)"), style={'flex': 1}),
+            dcc.Graph(figure=interval_figure(table, ['Accuracy'],
+                                             "Party-Call Accuracy by Model", "Share of counties"), style={'flex': 1}),
+        ], style={'display': 'flex', 'flexDirection': 'row'}),
+
+        html.H2("Largest Errors", style={"textAlign": "center"}),
+        html.Div(
+            dbc.Table.from_dataframe(data['worst'].round(3), striped=True, bordered=True, hover=True, size='sm'),
+            style={"width": "90%", "margin": "auto"}),
+
+        html.H2("Repeated Predictions", style={"textAlign": "center"}),
+        html.Div(repeated_list(data['repeated']), style={"width": "90%", "margin": "auto"}),
+    ])
@@ -1,101 +1,215 @@
 # pages/home.py
 
-import pandas as pd
-import json
-import requests
-import plotly.express as px
-from dash import html, dcc, register_page, callback, Output, Input
-from google.cloud import storage
-from io import StringIO
-
-# Set up GCS client
-client = storage.Client()
+import os
+import time
 
-# Bucket and blob names
-bucket_name = 'cleaned_dfs_census_data'
+import flask
+import plotly.express as px
+import plotly.graph_objects as go
+from dash import html, dcc, register_page, callback, clientside_callback, ClientsideFunction, Output, Input, State, Patch
+from dash.exceptions import PreventUpdate
 
-# Function to read CSV from GCS
-def read_gcs_csv(bucket_name, file_name):
-    bucket = client.bucket(bucket_name)
-    blob = bucket.blob(file_name)
-    data = blob.download_as_text()
-    return pd.read_csv(StringIO(data))
+import datastore
+import figure_cache
+import geometry
+import live
+import model_serving
+import tiles
 
 # Required for Dash pages system
 register_page(__name__, path="/", name="Home")
 
-# --- Load election data (GLOBAL) ---
-pres_election_2024 = read_gcs_csv(bucket_name, 'pres_election_2024.csv')
-
-# Adding a row for which way the county voted
-pres_election_2024['Party'] = pres_election_2024['Ratio'].apply(lambda x: 'dem' if x >= 1 else 'rep')
 color_discrete_map = {
     'dem': 'blue',
     'rep': 'red'
 }
 
-# Load GeoJSON
-url = "https://raw.githubusercontent.com/codeforgermany/click_that_hood/main/public/data/california-counties.geojson"
-response = requests.get(url)
-counties_geojson = response.json()
+# When on, all three models' predictions ship once with the page and the
+# model toggle recolors the maps in the browser (assets/model_toggle.js).
+# Set CLIENTSIDE_MODEL_TOGGLE=0 to fall back to server-side callbacks, which
+# send only the changed colors and title as a Patch.
+CLIENTSIDE_MODEL_TOGGLE = os.environ.get('CLIENTSIDE_MODEL_TOGGLE', '1') == '1'
+DEFAULT_MODEL = 'GB'
 
-# Load model predictions
-model_predictions = {
-    "MLP": pd.read_csv('https://raw.githubusercontent.com/MoriguchiBrandon/California-Presidential-Election-Analysis/main/electionData/2024_prediction_NN.csv'),
-    "RF": pd.read_csv('https://raw.githubusercontent.com/MoriguchiBrandon/California-Presidential-Election-Analysis/main/electionData/2024_prediction_RandomForest.csv'),
-    "GB": pd.read_csv('https://raw.githubusercontent.com/MoriguchiBrandon/California-Presidential-Election-Analysis/main/electionData/2024_prediction_GradientBoost.csv')
-}
+# MAP_TILES=1 draws the results map from vector tiles served by this app
+# (tiles.py) instead of embedding the county shapes in the figure.
+MAP_TILES = os.environ.get('MAP_TILES', '0') == '1'
+
+MAIN_TITLE = "California 2024 Presidential Election Results by County"
+DISCRETE_TITLE = "California 2024 Presidential Election Results by County (Red/Blue)"
+PREDICTION_TITLE = "Predicted 2024 Ratios ({model})"
+HISTORY_TITLE = "California {year} Presidential Election Results by County"
+COLOR_MAP_TITLE = "Model ({model}) – Predicted Election Results by County (Red/Blue)"
+
+
+# --- Data and prebuilt figures (built on first use) ---
+@datastore.lazy
+def get_data():
+    datastore.preload(['pres_election_2024', 'pres_election_history', 'prediction_MLP', 'prediction_RF', 'prediction_GB'])
+    pres_election_2024 = datastore.get('pres_election_2024')
+
+    # Adding a row for which way the county voted
+    pres_election_2024 = pres_election_2024.assign(Party=pres_election_2024['Ratio'].apply(lambda x: 'dem' if x >= 1 else 'rep'))
+
+    # Precompute the simplified county shapes
+    geometry.get_levels()
+
+    # Run the models (or read their saved predictions), adding a 'Party' column to each
+    predictions, predictions_version = model_serving.predictions('2024')
+    model_predictions = {
+        model_name: df.assign(Party=df['Predicted_Ratio'].apply(lambda x: 'dem' if x >= 1 else 'rep'))
+        for model_name, df in predictions.items()
+    }
+
+    # --- Main Election Figure ---
+    fig_main = px.choropleth_mapbox(
+        pres_election_2024,
+        geojson=geometry.counties_geojson(zoom=5, figure='fig_main'),
+        locations='Name',
+        featureidkey='properties.name',
+        color='Ratio',
+        color_continuous_scale="RdBu",
+        range_color=[0, 2],
+        mapbox_style="carto-positron",
+        zoom=5,
+        center={"lat": 37.5, "lon": -119.5},
+        opacity=0.6,
+    )
+    fig_main.update_layout(
+        title=MAIN_TITLE,
+        height=800,
+    )
+
+    # --- red or blue Election Figure ---
+    fig_discrete = discrete_figure(pres_election_2024)
+
+    fig_history = history_figure(datastore.get('pres_election_history'))
+
+    # Everything the browser needs to recolor the prediction maps
+    predictions_store = {
+        'titles': {'prediction-graph': PREDICTION_TITLE, 'right-choropleth': COLOR_MAP_TITLE},
+        'colors': color_discrete_map,
+        'models': {
+            model_name: df[['Name', 'Predicted_Ratio', 'Party']].to_dict('list')
+            for model_name, df in model_predictions.items()
+        },
+    }
+
+    return {
+        'predictions_store': predictions_store,
+        'version': datastore.version(['pres_election_2024']) + predictions_version,
+        'pres_election_2024': pres_election_2024,
+        'model_predictions': model_predictions,
+        'fig_main': fig_main,
+        'fig_discrete': fig_discrete,
+        'fig_history': fig_history,
+    }
+
+
+def discrete_figure(results):
+    fig = px.choropleth_mapbox(
+        results,
+        geojson=geometry.counties_geojson(zoom=5, figure='fig_discrete'),
+        locations='Name',
+        featureidkey='properties.name',
+        color='Party',
+        color_discrete_map=color_discrete_map,
+        mapbox_style="carto-positron",
+        zoom=5,
+        center={"lat": 37.5, "lon": -119.5},
+        opacity=0.6,
+    )
+    fig.update_layout(
+        title=DISCRETE_TITLE,
+        height=1000,
+    )
+    return fig
+
+
+def history_figure(history):
+    """Ratio map with one animation frame per election year.
+
+    The county shapes and locations are defined once on the base trace; each
+    frame only carries that year's colors and vote totals, so moving the
+    slider never resends geometry.
+    """
+    years = sorted(history['Year'].unique())
+    counties = sorted(history['Name'].unique())
+    by_year = {
+        column: history.pivot(index='Name', columns='Year', values=column).reindex(counties)
+        for column in ('Ratio', 'Democratic Vote Total', 'Republican Vote Total')
+    }
+
+    def year_trace(year):
+        votes = by_year['Democratic Vote Total'][year], by_year['Republican Vote Total'][year]
+        return dict(
+            z=by_year['Ratio'][year].round(3).tolist(),
+            customdata=[[int(d), int(r)] for d, r in zip(*votes)],
+        )
+
+    latest = years[-1]
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geometry.counties_geojson(zoom=5, figure='fig_history'),
+        locations=counties,
+        featureidkey='properties.name',
+        colorscale="RdBu",
+        zmin=0,
+        zmax=2,
+        marker_opacity=0.6,
+        colorbar_title="Ratio",
+        hovertemplate="<b>%{location}</b><br>Ratio: %{z:.2f}<br>Democratic: %{customdata[0]:,}"
+                      "<br>Republican: %{customdata[1]:,}<extra></extra>",
+        **year_trace(latest),
+    ))
+    fig.frames = [
+        go.Frame(
+            name=str(year),
+            data=[go.Choroplethmapbox(**year_trace(year))],
+            traces=[0],
+            layout={'title': {'text': HISTORY_TITLE.format(year=year)}},
+        )
+        for year in years
+    ]
+    step_args = {'mode': 'immediate', 'frame': {'duration': 0, 'redraw': True}, 'transition': {'duration': 0}}
+    fig.update_layout(
+        title=HISTORY_TITLE.format(year=latest),
+        height=800,
+        mapbox_style="carto-positron",
+        mapbox_zoom=5,
+        mapbox_center={"lat": 37.5, "lon": -119.5},
+        sliders=[{
+            'active': len(years) - 1,
+            'currentvalue': {'prefix': 'Election: '},
+            'steps': [
+                {'label': str(year), 'method': 'animate', 'args': [[str(year)], step_args]}
+                for year in years
+            ],
+        }],
+        updatemenus=[{
+            'type': 'buttons',
+            'showactive': False,
+            'x': 0, 'y': 0, 'xanchor': 'right', 'yanchor': 'top',
+            'buttons': [{
+                'label': 'Play',
+                'method': 'animate',
+                'args': [None, dict(step_args, frame={'duration': 800, 'redraw': True}, fromcurrent=True)],
+            }],
+        }],
+    )
+    return fig
 
-# Add 'Party' column to each model prediction DataFrame
-for model_name, df in model_predictions.items():
-    df['Party'] = df['Predicted_Ratio'].apply(lambda x: 'dem' if x >= 1 else 'rep')
-
-# --- Main Election Figure ---
-fig_main = px.choropleth_mapbox(
-    pres_election_2024,
-    geojson=counties_geojson,
-    locations='Name',
-    featureidkey='properties.name',
-    color='Ratio',
-    color_continuous_scale="RdBu",
-    range_color=[0, 2],
-    mapbox_style="carto-positron",
-    zoom=5,
-    center={"lat": 37.5, "lon": -119.5},
-    opacity=0.6,
-)
-fig_main.update_layout(
-    title="California 2024 Presidential Election Results by County",
-    height=800,
-)
-
-# --- red or blue Election Figure ---
-fig_discrete = px.choropleth_mapbox(
-    pres_election_2024,
-    geojson=counties_geojson,
-    locations='Name',
-    featureidkey='properties.name',
-    color='Party',
-    color_discrete_map=color_discrete_map,
-    mapbox_style="carto-positron",
-    zoom=5,
-    center={"lat": 37.5, "lon": -119.5},
-    opacity=0.6,
-)
-fig_discrete.update_layout(
-    title="California 2024 Presidential Election Results by County (Red/Blue)",
-    height=1000,
-)
 
 # --- Layout ---
 def layout():
+    data = get_data()
     return html.Div([
         html.H1("California 2024 Presidential Election Analysis", style={"textAlign": "center"}),
         html.P(
             "Welcome! This project visualizes and analyzes how California counties voted in the 2024 Presidential election.",
             style={"textAlign": "center", "fontSize": "18px"}),
         
-        dcc.Graph(figure=fig_main),
+        dcc.Graph(id='main-graph', figure=main_figure(data)),
+        *live_components(),
         html.P(
         """
         This is a map of California with each county within the state colored by a gradient of the ratio of democrat votes 
@@ -105,6 +219,17 @@ def layout():
 
         html.Hr(),
 
+        html.H2("Results Since 2004", style={"textAlign": "center"}),
+        dcc.Graph(id='history-graph', figure=data['fig_history']),
+        html.P(
+        """
+        The same Democratic/Republican ratio for every presidential election from 2004 to 2024. Drag the slider 
+        (or press Play) to step through the years.
+        """,
+        style={"padding": "20px", "fontSize": "16px", "textAlign": "center"}),
+
+        html.Hr(),
+
         html.H2("Model Predictions", style={"textAlign": "center"}),
 
         dcc.RadioItems(
@@ -114,12 +239,12 @@ def layout():
                 {'label': 'Random Forest', 'value': 'RF'},
                 {'label': 'Gradient Boosting', 'value': 'GB'},
             ],
-            value='GB',  # default = Gradient Boost
+            value=DEFAULT_MODEL,  # default = Gradient Boost
             labelStyle={'display': 'inline-block', 'margin': '10px'},
             style={'textAlign': 'center'}
         ),
 
-        dcc.Graph(id='prediction-graph'),
+        dcc.Graph(id='prediction-graph', **initial_figure(update_prediction)),
 
         html.P(
         """
@@ -134,8 +259,8 @@ def layout():
         html.H2("Comparison: Actual vs. Model Color Mapping", style={"textAlign": "center"}),
 
         html.Div([
-            dcc.Graph(id='left-choropleth', figure=fig_discrete, style={'flex': 1}),
-            dcc.Graph(id='right-choropleth', style={'flex': 1}),
+            dcc.Graph(id='left-choropleth', figure=data['fig_discrete'], style={'flex': 1}),
+            dcc.Graph(id='right-choropleth', style={'flex': 1}, **initial_figure(update_color_map)),
         ], style={'display': 'flex', 'flexDirection': 'row'}),
 
         html.P(
@@ -145,19 +270,49 @@ def layout():
         by the Democratic candidate, while red counties indicate a Republican win or prediction. 
         This comparison helps visualize where the model's predictions align with or diverge from the real outcomes.
         """,
-        style={"padding": "20px", "fontSize": "16px", "textAlign": "center"})
+        style={"padding": "20px", "fontSize": "16px", "textAlign": "center"}),
+
+        dcc.Store(id='model-predictions', data=data['predictions_store'] if CLIENTSIDE_MODEL_TOGGLE else None),
 ])
 
-# --- Callback for updating prediction graph ---
-@callback(
-    Output('prediction-graph', 'figure'),
-    Input('model-toggle', 'value')
-)
+
+def main_figure(data, results=None):
+    if not MAP_TILES:
+        return data['fig_main']
+    # Built per request: the tile URLs must be absolute, so they use this request's host
+    df = data['pres_election_2024'] if results is None else results
+    fig = tiles.choropleth_figure('counties', df['Name'], df['Ratio'], flask.request.host_url,
+                                  colorscale="RdBu", zrange=(0, 2), colorbar_title="Ratio")
+    fig.update_layout(title=MAIN_TITLE, height=800)
+    return fig
+
+
+def live_components():
+    if not live.ENABLED:
+        return []
+    return [
+        html.P(id='live-status', style={"textAlign": "center", "fontSize": "14px"}),
+        dcc.Interval(id='live-interval', interval=live.INTERVAL_MS),
+        # The live version this browser shows; 0 until its first update
+        dcc.Store(id='live-version', data={'version': 0, 'measure': False}),
+        dcc.Store(id='live-ack'),
+    ]
+
+
+def initial_figure(build):
+    # The maps are rendered once on the server for the default model; after
+    # that a model change only recolors them, in the browser or via a Patch.
+    return {'figure': build(DEFAULT_MODEL)}
+
+
+# --- Prediction graph ---
+@figure_cache.memoize(version=lambda: get_data()['version'])
 def update_prediction(selected_model):
-    pred_df = model_predictions[selected_model]
+    data = get_data()
+    pred_df = data['model_predictions'][selected_model]
     fig = px.choropleth_mapbox(
         pred_df,
-        geojson=counties_geojson,
+        geojson=geometry.counties_geojson(zoom=5, figure='prediction-graph'),
         locations='Name',
         featureidkey='properties.name',
         color='Predicted_Ratio',
@@ -169,20 +324,19 @@ def update_prediction(selected_model):
         opacity=0.6,
     )
     fig.update_layout(
-        title=f"Predicted 2024 Ratios ({selected_model})",
+        title=PREDICTION_TITLE.format(model=selected_model),
         height=800,
     )
     return fig
 
-@callback(
-Output('right-choropleth', 'figure'),
-Input('model-toggle', 'value')
-)
+# --- Predicted red/blue map ---
+@figure_cache.memoize(version=lambda: get_data()['version'])
 def update_color_map(selected_model):
-    pred_df = model_predictions[selected_model]
+    data = get_data()
+    pred_df = data['model_predictions'][selected_model]
     fig = px.choropleth_mapbox(
         pred_df,
-        geojson=counties_geojson,
+        geojson=geometry.counties_geojson(zoom=5, figure='right-choropleth'),
         locations='Name',
         featureidkey='properties.name',
         color='Party',  
@@ -192,9 +346,107 @@ def update_color_map(selected_model):
         center={"lat": 37.5, "lon": -119.5},
         opacity=0.6,)
     fig.update_layout(
-        title=f"Model ({selected_model}) – Predicted Election Results by County (Red/Blue)",
+        title=COLOR_MAP_TITLE.format(model=selected_model),
         height=1000,
         margin={"r":0, "t":50, "l":0, "b":0}
     )
     return fig
-   
\ No newline at end of file
+   
+
+
+# --- Model toggle callbacks ---
+if CLIENTSIDE_MODEL_TOGGLE:
+    clientside_callback(
+        ClientsideFunction(namespace='home', function_name='recolorPrediction'),
+        Output('prediction-graph', 'figure'),
+        Input('model-toggle', 'value'),
+        State('model-predictions', 'data'),
+        State('prediction-graph', 'figure'),
+    )
+    clientside_callback(
+        ClientsideFunction(namespace='home', function_name='recolorParty'),
+        Output('right-choropleth', 'figure'),
+        Input('model-toggle', 'value'),
+        State('model-predictions', 'data'),
+        State('right-choropleth', 'figure'),
+    )
+else:
+    @callback(Output('prediction-graph', 'figure'), Input('model-toggle', 'value'), prevent_initial_call=True)
+    def recolor_prediction(selected_model):
+        # The browser has the default model's figure; same trace, same county order
+        locations = update_prediction(DEFAULT_MODEL)['data'][0]['locations']
+        pred_df = get_data()['model_predictions'][selected_model].set_index('Name')
+        patch = Patch()
+        patch['data'][0]['z'] = pred_df['Predicted_Ratio'].reindex(locations).tolist()
+        patch['layout']['title']['text'] = PREDICTION_TITLE.format(model=selected_model)
+        return patch
+
+    @callback(Output('right-choropleth', 'figure'), Input('model-toggle', 'value'), prevent_initial_call=True)
+    def recolor_party(selected_model):
+        # px draws one trace per party present in the default model's figure;
+        # move each county to its predicted party's trace.
+        parties = [trace['name'] for trace in update_color_map(DEFAULT_MODEL)['data']]
+        pred_df = get_data()['model_predictions'][selected_model]
+        if not set(pred_df['Party']) <= set(parties):
+            return update_color_map(selected_model)
+        patch = Patch()
+        for i, party in enumerate(parties):
+            locations = pred_df.loc[pred_df['Party'] == party, 'Name'].tolist()
+            patch['data'][i]['locations'] = locations
+            patch['data'][i]['z'] = [1] * len(locations)
+        patch['layout']['title']['text'] = COLOR_MAP_TITLE.format(model=selected_model)
+        return patch
+
+
+# --- Live results (LIVE_RESULTS_DIR, see live.py) ---
+if live.ENABLED:
+    @callback(
+        Output('main-graph', 'figure'),
+        Output('left-choropleth', 'figure'),
+        Output('live-version', 'data'),
+        Output('live-status', 'children'),
+        Input('live-interval', 'n_intervals'),
+        State('live-version', 'data'),
+        prevent_initial_call=True,
+    )
+    def live_update(_, shown):
+        feed = live.get()
+        feed.poll()
+        version, changed = feed.changes_since(shown['version'])
+        if changed.empty:
+            raise PreventUpdate
+        data = get_data()
+        results = feed.overlay(data['pres_election_2024'])
+
+        if MAP_TILES:
+            main = main_figure(data, results)
+        else:
+            # Only the changed counties' colors; the trace is in pres_election_2024 order
+            main = Patch()
+            position = {name: i for i, name in enumerate(data['pres_election_2024']['Name'])}
+            for name, ratio in changed['Ratio'].items():
+                if name in position:
+                    main['data'][0]['z'][position[name]] = ratio
+
+        # The red/blue map has one trace per party: resend each trace's county list (a few hundred bytes)
+        parties = [trace['name'] for trace in data['fig_discrete']['data']]
+        if set(results['Party']) <= set(parties):
+            discrete = Patch()
+            for i, party in enumerate(parties):
+                locations = results.loc[results['Party'] == party, 'Name'].tolist()
+                discrete['data'][i]['locations'] = locations
+                discrete['data'][i]['z'] = [1] * len(locations)
+        else:
+            discrete = discrete_figure(results)
+
+        status = (f"Live results: file updated {time.strftime('%H:%M:%S', time.localtime(version))}, "
+                  f"{len(feed.totals)} counties reporting")
+        # The first update only catches the page up, so it isn't timed
+        return main, discrete, {'version': version, 'measure': shown['version'] > 0}, status
+
+    @callback(Output('live-ack', 'data'), Input('live-version', 'data'), prevent_initial_call=True)
+    def acknowledge(shown):
+        # Fires once the browser has applied live_update's response
+        if shown['measure']:
+            live.acknowledge(shown['version'])
+        return shown['version']
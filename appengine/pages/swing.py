@@ -0,0 +1,153 @@
+# pages/swing.py
+
+import copy
+import threading
+
+import pandas as pd
+import plotly.graph_objects as go
+import dash_bootstrap_components as dbc
+from dash import html, dcc, register_page, callback, Output, Input, Patch
+
+import datastore
+import geometry
+import live
+from swing import SwingEngine
+
+register_page(__name__, path="/swing", name="Swing")
+
+SWING_TITLE = "Shift in Two-Party Margin, {before} → {after} (points, + = toward Democrats)"
+MOVERS = 10
+LIVE_YEAR = 2024
+
+
+# --- Swing arrays (built on first use) ---
+@datastore.lazy
+def get_data():
+    return SwingEngine.from_history(datastore.get('pres_election_history'))
+
+
+# In live mode (LIVE_RESULTS_DIR, see live.py) the counts reported so far
+# replace LIVE_YEAR's totals; only the pairs involving that year are redone.
+# The update is made on a copy that then replaces the current engine, so
+# callbacks already holding the old one never see a half-updated year.
+_live_engine = None
+_live_version = 0.0
+_live_lock = threading.Lock()
+
+
+def get_engine():
+    global _live_engine, _live_version
+    if not live.ENABLED:
+        return get_data()
+    feed = live.get()
+    feed.poll()
+    with _live_lock:
+        engine = _live_engine or get_data()
+        version, changed = feed.changes_since(_live_version)
+        if len(changed):
+            k = engine.years.index(LIVE_YEAR) if LIVE_YEAR in engine.years else None
+            dem = pd.Series(engine.dem[k] if k is not None else float('nan'), index=engine.counties)
+            rep = pd.Series(engine.rep[k] if k is not None else float('nan'), index=engine.counties)
+            dem.update(changed['Democratic Vote Total'])
+            rep.update(changed['Republican Vote Total'])
+            engine = copy.deepcopy(engine)
+            engine.add_year(LIVE_YEAR, dem, rep)
+            _live_engine = engine
+        _live_version = version
+    return engine
+
+
+def swing_values(engine, before, after):
+    pair = engine.pair(before, after)
+    customdata = pair[['Ratio Before', 'Ratio After', 'Flipped']].round(3).to_numpy().tolist()
+    return pair['Margin Shift'].round(2).tolist(), customdata
+
+
+def swing_map(engine, before, after):
+    z, customdata = swing_values(engine, before, after)
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geometry.counties_geojson(zoom=5, figure='swing-map'),
+        locations=engine.counties,
+        featureidkey='properties.name',
+        z=z,
+        customdata=customdata,
+        colorscale="RdBu",
+        zmid=0,
+        zmin=-30,
+        zmax=30,
+        marker_opacity=0.6,
+        colorbar_title="Margin shift",
+        hovertemplate="<b>%{location}</b><br>Margin shift: %{z:+.1f} pts<br>Ratio: %{customdata[0]:.2f}"
+                      " → %{customdata[1]:.2f}<br>Flipped: %{customdata[2]}<extra></extra>",
+    ))
+    fig.update_layout(
+        title=SWING_TITLE.format(before=before, after=after),
+        height=800,
+        mapbox_style="carto-positron",
+        mapbox_zoom=5,
+        mapbox_center={"lat": 37.5, "lon": -119.5},
+    )
+    return fig
+
+
+def movers_table(engine, before, after):
+    movers = engine.movers(before, after, MOVERS)
+    movers['Flipped'] = movers['Flipped'].map({True: 'Yes', False: ''})
+    return dbc.Table.from_dataframe(movers.round(2), striped=True, bordered=True, hover=True, size='sm')
+
+
+# --- Layout ---
+def layout():
+    engine = get_engine()
+    before, after = engine.years[-2], engine.years[-1]
+    options = [{'label': str(year), 'value': year} for year in engine.years]
+    return html.Div([
+        html.H1("County Swing Between Elections", style={"textAlign": "center"}),
+        html.P(
+            """
+            Pick two presidential elections to see how far each county's two-party margin moved between them,
+            which counties flipped, and which moved the most.
+            """,
+            style={"textAlign": "center", "fontSize": "16px"}),
+
+        html.Div([
+            html.Label("From"),
+            dcc.Dropdown(id='swing-before', options=options, value=before, clearable=False,
+                         style={"width": "120px", "display": "inline-block", "margin": "0 1rem"}),
+            html.Label("To"),
+            dcc.Dropdown(id='swing-after', options=options, value=after, clearable=False,
+                         style={"width": "120px", "display": "inline-block", "margin": "0 1rem"}),
+        ], style={"display": "flex", "justifyContent": "center", "alignItems": "center"}),
+
+        html.H3(id='swing-flips', style={"textAlign": "center", "marginTop": "1rem"},
+                children=flips_summary(engine, before, after)),
+        dcc.Graph(id='swing-map', figure=swing_map(engine, before, after)),
+
+        html.H2("Biggest Movers", style={"textAlign": "center"}),
+        html.Div(id='swing-movers', children=movers_table(engine, before, after),
+                 style={"width": "80%", "margin": "auto"}),
+    ])
+
+
+def flips_summary(engine, before, after):
+    pair = engine.pair(before, after)
+    names = pair.loc[pair['Flipped'], 'Name'].tolist()
+    return f"{len(names)} counties flipped" + (f": {', '.join(names)}" if names else "")
+
+
+# --- Callbacks ---
+@callback(
+    Output('swing-map', 'figure'),
+    Output('swing-movers', 'children'),
+    Output('swing-flips', 'children'),
+    Input('swing-before', 'value'),
+    Input('swing-after', 'value'),
+    prevent_initial_call=True,
+)
+def update_swing(before, after):
+    # Same counties and geometry as the first render: only colors and title change
+    engine = get_engine()
+    patch = Patch()
+    patch['data'][0]['z'], patch['data'][0]['customdata'] = swing_values(engine, before, after)
+    patch['layout']['title']['text'] = SWING_TITLE.format(before=before, after=after)
+    return patch, movers_table(engine, before, after), flips_summary(engine, before, after)
@@ -0,0 +1,225 @@
+# pages/whatif.py
+
+import logging
+import functools
+import threading
+
+import numpy as np
+import plotly.graph_objects as go
+from dash import html, dcc, register_page, callback, Output, Input, State, ALL
+
+import correlation
+import geometry
+import jobs
+import model_serving
+import scenarios
+from metric_labels import label, column_mapping_positive, column_mapping_negative
+
+register_page(__name__, path="/whatif", name="What-If")
+
+MODEL_OPTIONS = [
+    {'label': 'Multi-Layer Perceptron', 'value': 'MLP'},
+    {'label': 'Random Forest', 'value': 'RF'},
+    {'label': 'Gradient Boosting', 'value': 'GB'},
+]
+TOP_K = 5
+
+# Sweeps run as background jobs (jobs.py); finished sweeps are reused until the models or data change
+SWEEPS = jobs.manager(version=lambda: get_data().version)
+
+
+# --- Simulator (built on first use, and again when new models are deployed) ---
+_simulator = {}            # manifest version -> Simulator
+_simulator_lock = threading.Lock()
+
+
+def get_data():
+    """The Simulator for the current models, or None when there are none (or it can't be built)."""
+    manifest = model_serving.read_manifest()
+    if manifest is None:
+        return None
+    with _simulator_lock:
+        simulator = _simulator.get(manifest['version'])
+        if simulator is None:
+            try:
+                simulator = scenarios.Simulator(manifest)
+            except Exception:
+                # Not remembered: the next request tries again
+                logging.exception('Could not build the what-if simulator')
+                return None
+            _simulator.clear()
+            _simulator[manifest['version']] = simulator
+    return simulator
+
+
+def slider_features():
+    """The census features that get a slider; every other feature stays unshifted.
+
+    The curated findings metrics the models were trained on, or else the
+    models' TOP_K most positively and negatively correlated features.
+    """
+    return _slider_features(get_data())
+
+
+@functools.lru_cache(maxsize=1)
+def _slider_features(simulator):
+    curated = [v['col'] for v in {**column_mapping_positive, **column_mapping_negative}.values()]
+    features = [col for col in curated if col in simulator.feature_index]
+    if features:
+        return features
+    table = correlation.get([simulator.year]).reindex(simulator.census_features)
+    positive, negative = correlation.top_k(table, k=TOP_K)
+    return positive + negative
+
+
+def county_map(counties, z, title, figure_name, colorscale="RdBu", zrange=(0, 2), colorbar_title="Predicted Ratio"):
+    fig = go.Figure(go.Choroplethmapbox(
+        geojson=geometry.counties_geojson(zoom=5, figure=figure_name),
+        locations=counties,
+        featureidkey='properties.name',
+        z=z,
+        colorscale=colorscale,
+        zmin=zrange[0],
+        zmax=zrange[1],
+        marker_opacity=0.6,
+        colorbar_title=colorbar_title,
+    ))
+    fig.update_layout(
+        title=title,
+        height=800,
+        mapbox_style="carto-positron",
+        mapbox_zoom=5,
+        mapbox_center={"lat": 37.5, "lon": -119.5},
+    )
+    return fig
+
+
+# --- Layout ---
+def layout():
+    simulator = get_data()
+    if simulator is None:
+        return html.Div([
+            html.H1("What-If Scenarios", style={"textAlign": "center"}),
+            html.P("No trained models (or their census inputs) are available, so scenarios can't be simulated yet.",
+                   style={"textAlign": "center"}),
+        ])
+
+    sliders = [
+        html.Div([
+            html.Label(label(col)),
+            dcc.Slider(
+                id={'type': 'whatif-shift', 'index': i},
+                min=-10, max=10, step=0.5, value=0,
+                marks={v: f"{v:+d}" for v in range(-10, 11, 5)},
+                updatemode='mouseup',
+            ),
+        ], style={"marginBottom": "1rem"})
+        for i, col in enumerate(slider_features())
+    ]
+
+    return html.Div([
+        html.H1("What-If Scenarios", style={"textAlign": "center"}),
+        html.P(
+            """
+            Shift census metrics for every county (in percentage points) and see how the selected model's
+            predicted 2024 results change, and how many counties would flip party.
+            """,
+            style={"textAlign": "center", "fontSize": "16px"}),
+
+        dcc.RadioItems(
+            id='whatif-model',
+            options=MODEL_OPTIONS,
+            value='GB',
+            labelStyle={'display': 'inline-block', 'margin': '10px'},
+            style={'textAlign': 'center'}
+        ),
+
+        html.Div(sliders, style={"width": "80%", "margin": "auto"}),
+
+        html.H3(id='whatif-flips', style={"textAlign": "center"}),
+        dcc.Graph(id='whatif-map'),
+
+        html.Hr(),
+
+        html.H2("Monte Carlo Sweep", style={"textAlign": "center"}),
+        html.P(
+            """
+            Runs thousands of random scenarios around the shifts above (normal noise on the same metrics, with
+            the chosen standard deviation in percentage points) and shows how often each county flips.
+            """,
+            style={"textAlign": "center", "fontSize": "16px"}),
+        html.Div([
+            html.Label("Scenarios"),
+            dcc.Input(id='whatif-runs', type='number', min=100, max=20000, step=100, value=2000),
+            html.Label("Std. dev. (points)", style={"marginLeft": "1rem"}),
+            dcc.Input(id='whatif-scale', type='number', min=0.5, max=10, step=0.5, value=2),
+            html.Button("Run sweep", id='whatif-run', n_clicks=0, style={"marginLeft": "1rem"}),
+            html.Button("Cancel", id='whatif-cancel', n_clicks=0, disabled=True, style={"marginLeft": "0.5rem"}),
+        ], style={"textAlign": "center"}),
+        html.Div(html.Progress(id='whatif-progress', value='0', max='1'), style={"textAlign": "center"}),
+        html.Div([
+            dcc.Graph(id='whatif-flip-histogram', style={'flex': 1}),
+            dcc.Graph(id='whatif-flip-map', style={'flex': 1}),
+        ], style={'display': 'flex', 'flexDirection': 'row'}),
+    ])
+
+
+# --- Callbacks ---
+@callback(
+    Output('whatif-map', 'figure'),
+    Output('whatif-flips', 'children'),
+    Input('whatif-model', 'value'),
+    Input({'type': 'whatif-shift', 'index': ALL}, 'value'),
+)
+def update_scenario(selected_model, shifts):
+    simulator = get_data()
+    vector = simulator.shift_vector(dict(zip(slider_features(), shifts)))
+    predicted = simulator.evaluate([vector], models=[selected_model])[selected_model][0]
+    flipped = simulator.flips(predicted[None, :], selected_model)[0]
+    names = [name for name, f in zip(simulator.counties, flipped) if f]
+    summary = f"{len(names)} counties flip party" + (f": {', '.join(names)}" if names else "")
+    title = f"Predicted 2024 Ratios under this scenario ({selected_model})"
+    return county_map(simulator.counties, predicted, title, 'whatif-map'), summary
+
+
+@callback(
+    Output('whatif-flip-histogram', 'figure'),
+    Output('whatif-flip-map', 'figure'),
+    Input('whatif-run', 'n_clicks'),
+    State('whatif-model', 'value'),
+    State({'type': 'whatif-shift', 'index': ALL}, 'value'),
+    State('whatif-runs', 'value'),
+    State('whatif-scale', 'value'),
+    prevent_initial_call=True,
+    background=True,
+    manager=SWEEPS,
+    # The click count only starts the job; it isn't part of what is computed
+    cache_args_to_ignore=[0],
+    progress=[Output('whatif-progress', 'value'), Output('whatif-progress', 'max')],
+    running=[
+        (Output('whatif-run', 'disabled'), True, False),
+        (Output('whatif-cancel', 'disabled'), False, True),
+    ],
+    cancel=[Input('whatif-cancel', 'n_clicks')],
+)
+def run_sweep(set_progress, n_clicks, selected_model, shifts, runs, scale):
+    simulator = get_data()
+    features = slider_features()
+    result = simulator.monte_carlo(selected_model, n=int(runs or 2000), scale=float(scale or 2),
+                                   mean=simulator.shift_vector(dict(zip(features, shifts))), features=features,
+                                   progress=lambda done, total: set_progress((str(done), str(total))))
+
+    counts = np.bincount(result['flips'], minlength=len(simulator.counties) + 1)
+    histogram = go.Figure(go.Bar(x=np.arange(len(counts)), y=counts))
+    histogram.update_layout(
+        title=f"Counties flipped across {len(result['flips'])} scenarios ({selected_model})",
+        xaxis_title="Counties flipped",
+        yaxis_title="Scenarios",
+        template='plotly_white',
+    )
+
+    flip_map = county_map(
+        simulator.counties, result['flip_probability'], "Probability each county flips", 'whatif-flip-map',
+        colorscale="Purples", zrange=(0, 1), colorbar_title="P(flip)",
+    )
+    return histogram, flip_map
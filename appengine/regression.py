@@ -0,0 +1,68 @@
+# regression.py
+#
+# Ordinary least squares of y = intercept + slope * x for many (metric, year)
+# pairs at once.
+#
+# The findings page used to call px.scatter(..., trendline='ols') on every
+# dropdown change, fitting a statsmodels model per year. Here every metric is
+# fitted against Ratio for every year in one NumPy pass when the page data is
+# loaded, and the callbacks only read the stored lines.
+
+import numpy as np
+import pandas as pd
+
+
+def fit_batch(x, y):
+    """Fit a line to each row of `x` / `y` (arrays of the same shape, (..., n)).
+
+    NaNs in either array drop that observation from its row only. Returns a
+    dict of arrays shaped like x[..., 0]: slope, intercept, r2, n and the
+    range of x the line is drawn over (x_min, x_max).
+    """
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    valid = ~(np.isnan(x) | np.isnan(y))
+    n = valid.sum(axis=-1)
+    xv = np.where(valid, x, 0.0)
+    yv = np.where(valid, y, 0.0)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        x_mean = xv.sum(axis=-1) / n
+        y_mean = yv.sum(axis=-1) / n
+        dx = np.where(valid, x - x_mean[..., None], 0.0)
+        dy = np.where(valid, y - y_mean[..., None], 0.0)
+        sxx = (dx * dx).sum(axis=-1)
+        sxy = (dx * dy).sum(axis=-1)
+        syy = (dy * dy).sum(axis=-1)
+
+        slope = sxy / sxx
+        intercept = y_mean - slope * x_mean
+        sse = syy - slope * sxy
+        r2 = 1 - sse / syy
+
+    return {
+        'slope': slope,
+        'intercept': intercept,
+        'r2': r2,
+        'n': n,
+        'x_min': np.where(valid, x, np.inf).min(axis=-1),
+        'x_max': np.where(valid, x, -np.inf).max(axis=-1),
+    }
+
+
+def fit_all(x, y, metrics, years):
+    """Fit every metric against `y` for every year.
+
+    `x` is a (metric, year, county) array and `y` a (year, county) array.
+    Returns a DataFrame indexed by (metric, year) with the fit_batch results
+    plus the fitted line's endpoints (y_at_min, y_at_max).
+    """
+    x = np.asarray(x, dtype=float)
+    target = np.broadcast_to(np.asarray(y, dtype=float), x.shape)
+    fits = fit_batch(x, target)
+    fits['y_at_min'] = fits['intercept'] + fits['slope'] * fits['x_min']
+    fits['y_at_max'] = fits['intercept'] + fits['slope'] * fits['x_max']
+
+    index = pd.MultiIndex.from_product([list(metrics), list(years)], names=['metric', 'year'])
+    return pd.DataFrame({name: values.reshape(-1) for name, values in fits.items()}, index=index)
+
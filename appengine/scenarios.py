@@ -0,0 +1,104 @@
+# scenarios.py
+#
+# What-if simulation: shift census metrics for every county and see what the
+# models predict.
+#
+# All scenarios are evaluated as one array. A batch of S shift vectors over F
+# model features is broadcast against the (county, feature) baseline into an
+# (S * counties, F) matrix, which goes through each model in a single
+# predict() call. Monte Carlo sweeps are just a large batch of random shifts,
+# evaluated a few hundred scenarios at a time so they can report progress.
+#
+# A shifted feature is kept in its valid range: 0-100 for percentages, at
+# least 0 for counts, dollars and averages. Features a scenario doesn't shift
+# are passed through untouched, so the all-zero scenario is the baseline.
+
+import re
+
+import numpy as np
+
+import datastore
+import model_serving
+
+
+# Last column level of census features that are not percentages
+NOT_PERCENT = re.compile(r'dollars|average|median|mean|size', re.IGNORECASE)
+
+
+def bounds(features, X):
+    """(lower, upper) arrays of the valid range of each census feature (columns of X)."""
+    percent = np.array([not NOT_PERCENT.search(f.split('!!')[-1]) for f in features])
+    percent &= np.nanmax(np.where(np.isnan(X), 0, X), axis=0) <= 100
+    return np.zeros(len(features), dtype=np.float32), np.where(percent, 100, np.inf).astype(np.float32)
+
+
+class Simulator:
+    """Scenario evaluation for one year's counties against the served models."""
+
+    def __init__(self, manifest, year=None):
+        self.manifest = manifest
+        self.year = year or manifest['year']
+        self.counties, self.X = model_serving.feature_matrix(manifest, self.year)
+        self.census_features = list(manifest['census_features'])
+        self.feature_index = {f: i for i, f in enumerate(self.census_features)}
+        self.lower, self.upper = bounds(self.census_features, self.X[:, :len(self.census_features)])
+        self.baseline = {name: values[0] for name, values in self.evaluate([self.shift_vector({})]).items()}
+        # Identifies the models and census data the scenarios are run against
+        self.version = f"{manifest.get('version')}.{datastore.version([f'df_{self.year}', f'pres_election_{self.year}', 'census_alignment'])}"
+
+    def evaluate(self, shifts, models=model_serving.MODELS):
+        """Predicted ratios for a batch of scenarios.
+
+        `shifts` is (scenarios, census features) in percentage points, added to
+        every county's census values (shifted features are kept within
+        bounds()). Returns model -> (scenarios, counties) array.
+        """
+        shifts = np.atleast_2d(np.asarray(shifts, dtype=np.float32))
+        n_census = len(self.census_features)
+        full = np.zeros((len(shifts), self.X.shape[1]), dtype=np.float32)
+        full[:, :n_census] = shifts
+        batch = self.X[None, :, :] + full[:, None, :]
+        census = batch[:, :, :n_census]
+        shifted = (shifts != 0)[:, None, :]
+        batch[:, :, :n_census] = np.where(shifted, np.clip(census, self.lower, self.upper), census)
+        flat = batch.reshape(-1, self.X.shape[1])
+        predicted = model_serving.predict(flat, self.manifest, models=models)
+        return {name: values.reshape(len(shifts), len(self.counties)) for name, values in predicted.items()}
+
+    def shift_vector(self, shifts):
+        """(census features,) shift array from {feature: points}; features not given are 0."""
+        vector = np.zeros(len(self.census_features), dtype=np.float32)
+        for feature, points in shifts.items():
+            vector[self.feature_index[feature]] = points or 0
+        return vector
+
+    def flips(self, predicted, model):
+        """(scenarios, counties) bool: county's predicted party differs from the unshifted prediction."""
+        return (predicted >= 1) != (self.baseline[model] >= 1)[None, :]
+
+    def monte_carlo(self, model, n=2000, scale=2.0, mean=None, features=None, seed=0, batch=500, progress=None):
+        """Random sweep: n scenarios with normal shifts (sd `scale` points) around `mean`.
+
+        Only `features` (default: every census feature) get noise. Scenarios
+        go through the model `batch` at a time; `progress(done, n)` is called
+        after each batch. Returns {'flips': flips per scenario,
+        'flip_probability': per county, 'mean_ratio': per county}.
+        """
+        rng = np.random.default_rng(seed)
+        center = np.zeros(len(self.census_features)) if mean is None else np.asarray(mean, dtype=float)
+        columns = (np.arange(len(self.census_features)) if features is None
+                   else np.array([self.feature_index[f] for f in features]))
+        shifts = np.tile(center, (n, 1))
+        shifts[:, columns] += rng.normal(0, scale, size=(n, len(columns)))
+        parts = []
+        for start in range(0, n, batch):
+            parts.append(self.evaluate(shifts[start:start + batch], models=[model])[model])
+            if progress is not None:
+                progress(min(start + batch, n), n)
+        predicted = np.vstack(parts)
+        flipped = self.flips(predicted, model)
+        return {
+            'flips': flipped.sum(axis=1),
+            'flip_probability': flipped.mean(axis=0),
+            'mean_ratio': predicted.mean(axis=0),
+        }
@@ -0,0 +1,92 @@
+# swing.py
+#
+# County swings between any two elections.
+#
+# From the per-year Democratic/Republican totals (pres_election_history.csv)
+# every pair of years is compared in one broadcast:
+#   ratio_swing[i, j, c]   Ratio in year j minus Ratio in year i
+#   margin_shift[i, j, c]  two-party margin (D - R) / (D + R) in year j minus
+#                          year i, in percentage points
+#   flipped[i, j, c]       the county's winner differs between i and j
+# so a swing map or "biggest movers" table for any pair is an index into
+# these (year, year, county) arrays. add_year() extends them with one new
+# row and column instead of recomputing every pair.
+
+import numpy as np
+import pandas as pd
+
+
+class SwingEngine:
+    """Pairwise swing arrays over (year, year, county)."""
+
+    def __init__(self, years, counties, dem, rep):
+        self.years = [int(y) for y in years]
+        self.counties = list(counties)
+        self.dem = np.asarray(dem, dtype=np.float64)      # (year, county)
+        self.rep = np.asarray(rep, dtype=np.float64)
+        self.ratio = self.dem / self.rep
+        self.margin = 100 * (self.dem - self.rep) / (self.dem + self.rep)
+        self.ratio_swing = self.ratio[None, :, :] - self.ratio[:, None, :]
+        self.margin_shift = self.margin[None, :, :] - self.margin[:, None, :]
+        won = self.margin > 0
+        self.flipped = won[None, :, :] != won[:, None, :]
+
+    @classmethod
+    def from_history(cls, history):
+        """Build from a frame with Year, Name, Democratic Vote Total, Republican Vote Total."""
+        dem = history.pivot(index='Year', columns='Name', values='Democratic Vote Total').sort_index()
+        rep = history.pivot(index='Year', columns='Name', values='Republican Vote Total').reindex_like(dem)
+        return cls(dem.index, dem.columns, dem.to_numpy(), rep.to_numpy())
+
+    def _index(self, year):
+        return self.years.index(int(year))
+
+    def pair(self, from_year, to_year):
+        """Per-county swing from `from_year` to `to_year`, one row per county."""
+        i, j = self._index(from_year), self._index(to_year)
+        return pd.DataFrame({
+            'Name': self.counties,
+            'Ratio Before': self.ratio[i],
+            'Ratio After': self.ratio[j],
+            'Ratio Swing': self.ratio_swing[i, j],
+            'Margin Shift': self.margin_shift[i, j],
+            'Flipped': self.flipped[i, j],
+        })
+
+    def movers(self, from_year, to_year, n=10):
+        """The `n` counties whose margin moved the most (either direction)."""
+        i, j = self._index(from_year), self._index(to_year)
+        order = np.argsort(-np.abs(self.margin_shift[i, j]), kind='stable')[:n]
+        return self.pair(from_year, to_year).iloc[order].reset_index(drop=True)
+
+    def add_year(self, year, dem, rep):
+        """Add (or replace) one year's totals, computing only the pairs that involve it.
+
+        `dem` / `rep` map county name -> votes.
+        """
+        year = int(year)
+        dem = pd.Series(dem, dtype=float).reindex(self.counties).to_numpy()
+        rep = pd.Series(rep, dtype=float).reindex(self.counties).to_numpy()
+        if year in self.years:
+            k = self._index(year)
+        else:
+            k = int(np.searchsorted(self.years, year))
+            self.years.insert(k, year)
+            self.dem = np.insert(self.dem, k, 0, axis=0)
+            self.rep = np.insert(self.rep, k, 0, axis=0)
+            self.ratio = np.insert(self.ratio, k, 0, axis=0)
+            self.margin = np.insert(self.margin, k, 0, axis=0)
+            for name in ('ratio_swing', 'margin_shift', 'flipped'):
+                grown = np.insert(np.insert(getattr(self, name), k, 0, axis=0), k, 0, axis=1)
+                setattr(self, name, grown)
+
+        self.dem[k], self.rep[k] = dem, rep
+        self.ratio[k] = dem / rep
+        self.margin[k] = 100 * (dem - rep) / (dem + rep)
+        won = self.margin > 0
+        self.ratio_swing[k] = self.ratio - self.ratio[k]
+        self.ratio_swing[:, k] = self.ratio[k] - self.ratio
+        self.margin_shift[k] = self.margin - self.margin[k]
+        self.margin_shift[:, k] = self.margin[k] - self.margin
+        self.flipped[k] = won != won[k]
+        self.flipped[:, k] = won[k] != won
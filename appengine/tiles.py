@@ -0,0 +1,312 @@
+# tiles.py
+#
+# Vector-tile rendering for choropleth maps with too many shapes to embed.
+#
+# A figure drawn this way carries no geometry. Its map has one fill layer per
+# color bin, each reading the Mapbox Vector Tiles that
+#   /tiles/<tileset>/<key>/<z>/<x>/<y>.pbf
+# serves from this server, so the browser only downloads the shapes in view,
+# at a resolution matching the zoom. <key> identifies the values the figure
+# was built with (registered server-side by register()); inside each tile the
+# features are sorted into one layer per color bin for them.
+#
+# Tiles are cut on request from the tileset's GeoJSON:
+#   - the GeoJSON is simplified once per zoom level (geometry.simplify, so
+#     shared borders stay consistent) to about a pixel of error,
+#   - the features whose bounding box meets the tile are picked with one
+#     vectorized test, then clipped to the tile plus a small buffer and
+#     encoded,
+# and encoded tiles are kept in an LRU cache. Nothing needs a tile service
+# or network access.
+#
+# Mapbox fill layers can't show hover labels, so maps drawn this way have no
+# per-feature tooltip.
+
+import json
+import hashlib
+import functools
+import threading
+import collections
+
+import numpy as np
+import plotly.graph_objects as go
+from plotly.colors import sample_colorscale
+from flask import Response, abort
+
+import datastore
+import figure_cache
+import geometry
+
+EXTENT = 4096          # tile coordinate range
+BUFFER = 64            # clip margin around each tile, in tile units
+MAX_ZOOM = 12          # deeper zooms reuse this level's shapes
+N_BINS = 9
+TILE_CACHE_SIZE = 4096
+BINS_CACHE_SIZE = 256  # registered keys kept in memory; live updates register a new one each time
+
+
+# --- Projection and clipping ---
+
+def _mercator(coords):
+    """(n, 2) lon/lat -> (n, 2) web mercator in [0, 1] x [0, 1], y down."""
+    lon, lat = coords[:, 0], np.radians(np.clip(coords[:, 1], -85.0511, 85.0511))
+    x = (lon + 180) / 360
+    y = (1 - np.log(np.tan(lat) + 1 / np.cos(lat)) / np.pi) / 2
+    return np.column_stack([x, y])
+
+
+def _clip_edge(points, axis, bound, keep_below):
+    out = []
+    prev = points[-1]
+    prev_in = prev[axis] <= bound if keep_below else prev[axis] >= bound
+    for point in points:
+        inside = point[axis] <= bound if keep_below else point[axis] >= bound
+        if inside != prev_in:
+            t = (bound - prev[axis]) / (point[axis] - prev[axis])
+            out.append(prev + t * (point - prev))
+        if inside:
+            out.append(point)
+        prev, prev_in = point, inside
+    return np.array(out)
+
+
+def _clip_ring(ring, lo, hi):
+    """Sutherland–Hodgman clip of an open ring to the square [lo, hi]^2."""
+    if ring.min() >= lo and ring.max() <= hi:
+        return ring
+    for axis in (0, 1):
+        for bound, keep_below in ((lo, False), (hi, True)):
+            ring = _clip_edge(ring, axis, bound, keep_below)
+            if len(ring) < 3:
+                return None
+    return ring
+
+
+# --- Encoding (Mapbox Vector Tile 2.1 protobuf) ---
+
+def _varint(n):
+    out = bytearray()
+    while True:
+        byte = n & 0x7F
+        n >>= 7
+        if n:
+            out.append(byte | 0x80)
+        else:
+            out.append(byte)
+            return bytes(out)
+
+
+def _field(number, payload):
+    """Length-delimited protobuf field."""
+    return _varint(number << 3 | 2) + _varint(len(payload)) + payload
+
+
+def _uint_field(number, value):
+    return _varint(number << 3) + _varint(value)
+
+
+def _zigzag(n):
+    return (n << 1) ^ (n >> 63)
+
+
+def _polygon_commands(polygons):
+    """Geometry commands for [[exterior, hole, ...], ...] rings of (n, 2) int tile coordinates."""
+    commands = []
+    cursor = np.zeros(2, dtype=np.int64)
+    for polygon in polygons:
+        for i, ring in enumerate(polygon):
+            x, y = ring[:, 0], ring[:, 1]
+            area = np.sum(x * np.roll(y, -1) - np.roll(x, -1) * y)
+            # Exterior rings have positive area in tile coordinates (y down), holes negative
+            if (area > 0) != (i == 0):
+                ring = ring[::-1]
+            start = ring[0] - cursor
+            deltas = np.diff(ring, axis=0)
+            commands += [1 | 1 << 3, _zigzag(int(start[0])), _zigzag(int(start[1])), 2 | len(deltas) << 3]
+            commands += [_zigzag(int(d)) for d in deltas.ravel()]
+            commands.append(7 | 1 << 3)
+            cursor = ring[-1]
+    return commands
+
+
+def encode_layer(name, features):
+    """One tile layer from [(feature id, feature name, polygons), ...]; b'' if it has no features."""
+    if not features:
+        return b''
+    body = _field(1, name.encode()) + _uint_field(15, 2) + _uint_field(5, EXTENT)
+    for value_index, (fid, _, polygons) in enumerate(features):
+        commands = _polygon_commands(polygons)
+        body += _field(2, (
+            _uint_field(1, fid)
+            + _field(2, _varint(0) + _varint(value_index))      # tags: name = value_index
+            + _uint_field(3, 3)                                 # POLYGON
+            + _field(4, b''.join(_varint(c) for c in commands))
+        ))
+    body += _field(3, b'name')
+    for _, feature_name, _ in features:
+        body += _field(4, _field(1, str(feature_name).encode()))
+    return _field(3, body)
+
+
+# --- Tile sets ---
+
+class TileSet:
+    """A GeoJSON FeatureCollection, cut into vector tiles on request."""
+
+    def __init__(self, geojson, id_property='name'):
+        self.geojson = geojson
+        self.names = [str(f['properties'][id_property]) for f in geojson['features']]
+        self._levels = {}
+        self._lock = threading.Lock()
+
+    def level(self, zoom):
+        """(projected features, bounding boxes) simplified to about a pixel at `zoom`."""
+        zoom = min(zoom, MAX_ZOOM)
+        with self._lock:
+            if zoom not in self._levels:
+                tolerance = 0 if zoom == MAX_ZOOM else 360 / (256 * 2 ** zoom)
+                simplified = geometry.simplify(self.geojson, tolerance)
+                features = []
+                for feature in simplified['features']:
+                    shape = feature['geometry']
+                    polygons = shape['coordinates'] if shape['type'] == 'MultiPolygon' else [shape['coordinates']]
+                    features.append([[_mercator(np.asarray(ring[:-1], dtype=float)) for ring in polygon]
+                                     for polygon in polygons])
+                bounds = np.array([
+                    np.concatenate([np.vstack([p[0] for p in polygons]).min(axis=0),
+                                    np.vstack([p[0] for p in polygons]).max(axis=0)])
+                    for polygons in features
+                ])
+                self._levels[zoom] = (features, bounds)
+            return self._levels[zoom]
+
+    def tile(self, z, x, y, bins):
+        """Encoded tile (z, x, y) with one layer per bin; `bins` maps feature name -> bin."""
+        features, bounds = self.level(z)
+        scale = 2 ** z
+        pad = BUFFER / EXTENT
+        lo, hi = np.array([x, y]) / scale - pad / scale, np.array([x + 1, y + 1]) / scale + pad / scale
+        hits = np.flatnonzero((bounds[:, 0] <= hi[0]) & (bounds[:, 2] >= lo[0])
+                              & (bounds[:, 1] <= hi[1]) & (bounds[:, 3] >= lo[1]))
+        layers = {}
+        for i in hits:
+            bin_index = bins.get(self.names[i])
+            if bin_index is None:
+                continue
+            polygons = []
+            for polygon in features[i]:
+                rings = []
+                for j, ring in enumerate(polygon):
+                    clipped = _clip_ring((ring * scale - [x, y]) * EXTENT, -BUFFER, EXTENT + BUFFER)
+                    points = None if clipped is None else np.rint(clipped).astype(np.int64)
+                    if points is not None:
+                        points = points[np.any(points != np.roll(points, 1, axis=0), axis=1)]
+                    if points is None or len(points) < 3:
+                        if j == 0:
+                            break       # the exterior is outside this tile: skip its holes too
+                        continue
+                    rings.append(points)
+                if rings:
+                    polygons.append(rings)
+            if polygons:
+                layers.setdefault(bin_index, []).append((int(i) + 1, self.names[i], polygons))
+        return b''.join(encode_layer(f'bin{k}', layers[k]) for k in sorted(layers))
+
+
+# name -> builder of the TileSet
+TILESETS = {
+    'counties': datastore.lazy(lambda: TileSet(geometry.get_levels()[0][0])),
+}
+
+
+# --- Values ---
+# key -> {feature name: bin}, the BINS_CACHE_SIZE most recently used; all of
+# them are also kept in the shared figure cache (itself an LRU bounded by
+# size) so any worker can serve tiles for a figure another worker built.
+_bins = collections.OrderedDict()
+_bins_lock = threading.Lock()
+
+
+def _remember(key, bins):
+    with _bins_lock:
+        _bins[key] = bins
+        _bins.move_to_end(key)
+        while len(_bins) > BINS_CACHE_SIZE:
+            _bins.popitem(last=False)
+
+
+def register(locations, values, zrange, colorscale, n_bins=N_BINS):
+    """Bin `values` for the tile server. Returns (key, color of each bin)."""
+    values = np.asarray(values, dtype=float)
+    edges = np.linspace(zrange[0], zrange[1], n_bins + 1)[1:-1]
+    indices = np.digitize(values, edges)
+    bins = {str(name): int(b) for name, b, v in zip(locations, indices, values) if not np.isnan(v)}
+    key = hashlib.sha1(json.dumps(bins, sort_keys=True).encode()).hexdigest()[:16]
+    if _lookup(key) is None:
+        figure_cache.get_cache().set(('tiles', key), bins)
+    _remember(key, bins)
+    colors = sample_colorscale(colorscale, [(k + 0.5) / n_bins for k in range(n_bins)])
+    return key, colors
+
+
+def _lookup(key):
+    with _bins_lock:
+        bins = _bins.get(key)
+        if bins is not None:
+            _bins.move_to_end(key)
+            return bins
+    bins = figure_cache.get_cache().get(('tiles', key))
+    if bins is not None:
+        _remember(key, bins)
+    return bins
+
+
+@functools.lru_cache(maxsize=TILE_CACHE_SIZE)
+def tile(name, key, z, x, y):
+    """Encoded tile for a registered key (see _serve)."""
+    return TILESETS[name]().tile(z, x, y, _lookup(key))
+
+
+def choropleth_figure(tileset, locations, values, base_url, colorscale="RdBu", zrange=(0, 2),
+                      opacity=0.6, colorbar_title=None):
+    """A mapbox figure that draws `values` over `tileset` from vector tiles.
+
+    `base_url` is this server's absolute root URL; the map's tile requests are
+    made from a web worker, which can't resolve relative URLs.
+    """
+    key, colors = register(locations, values, zrange, colorscale)
+    source = f"{base_url.rstrip('/')}/tiles/{tileset}/{key}/{{z}}/{{x}}/{{y}}.pbf"
+    layers = [
+        dict(sourcetype='vector', source=[source], sourcelayer=f'bin{k}', type='fill',
+             color=color, opacity=opacity, below='traces')
+        for k, color in enumerate(colors)
+    ]
+    # An invisible point, only there to draw the color bar
+    fig = go.Figure(go.Scattermapbox(
+        lat=[37.5], lon=[-119.5], mode='markers', hoverinfo='skip',
+        marker=dict(size=0, opacity=0, color=[zrange[0]], colorscale=colorscale, cmin=zrange[0], cmax=zrange[1],
+                    showscale=True, colorbar=dict(title=colorbar_title)),
+    ))
+    fig.update_layout(
+        mapbox_style="carto-positron",
+        mapbox_zoom=5,
+        mapbox_center={"lat": 37.5, "lon": -119.5},
+        mapbox_layers=layers,
+    )
+    return fig
+
+
+# --- Route ---
+
+def _serve(name, key, z, x, y):
+    if name not in TILESETS or z > 22 or not (0 <= x < 2 ** z and 0 <= y < 2 ** z):
+        abort(404)
+    if _lookup(key) is None:
+        abort(404)
+    return Response(tile(name, key, z, x, y), mimetype='application/x-protobuf',
+                    headers={'Cache-Control': 'public, max-age=31536000, immutable'})
+
+
+def serve(server):
+    """Add the tile route to a Flask server."""
+    server.add_url_rule('/tiles/<name>/<key>/<int:z>/<int:x>/<int:y>.pbf', 'tiles', _serve)
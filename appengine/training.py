@@ -0,0 +1,201 @@
+# training.py
+#
+# Reproducible training for the MLP / Random Forest / Gradient Boosting
+# models that model_serving.py serves.
+#
+#   python training.py [--train-years 2016 2020] [--predict-year 2024] [--jobs N]
+#
+# Stages (wall-clock time of each is printed and saved in the manifest):
+#   features   build the (county, feature) matrices for every year from the
+#              census and election tables, cached on disk by data version
+#   search     cross-validated hyperparameter search, folds grouped by county;
+#              every (model, params, fold) fit runs as its own task on a
+#              process pool over all cores
+#   fit        refit each model's best parameters on all training years
+#   write      save versioned artifacts to MODEL_DIR/<version>/, point
+#              MODEL_DIR/manifest.json at them and write the
+#              2024_prediction_*.csv files
+
+import os
+import json
+import time
+import argparse
+import itertools
+import logging
+from datetime import datetime, timezone
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+import datastore
+import feature_store
+import model_serving
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR = os.path.join(datastore.CACHE_DIR, 'training')
+PREDICTIONS_DIR = os.path.join(os.path.dirname(datastore.APP_DIR), 'electionData')
+ELECTION_FEATURES = ['voted_democrat_in_prev', 'voted_the_same_past_2']
+PREDICTION_FILES = {
+    'MLP': '2024_prediction_NN.csv',
+    'RF': '2024_prediction_RandomForest.csv',
+    'GB': '2024_prediction_GradientBoost.csv',
+}
+ARTIFACT_FILES = {'MLP': 'mlp.joblib', 'RF': 'rf.joblib', 'GB': 'gb.joblib'}
+
+PARAM_GRIDS = {
+    'MLP': {'hidden_layer_sizes': [(32,), (64, 32)], 'alpha': [1e-3, 1e-2]},
+    'RF': {'n_estimators': [300], 'max_depth': [None, 6], 'min_samples_leaf': [1, 3]},
+    'GB': {'n_estimators': [100, 300], 'learning_rate': [0.05, 0.1], 'max_depth': [2, 3]},
+}
+CV_FOLDS = 5
+SEED = 0
+
+
+def make_model(name, params):
+    from sklearn.ensemble import GradientBoostingRegressor, RandomForestRegressor
+    from sklearn.neural_network import MLPRegressor
+    from sklearn.pipeline import make_pipeline
+    from sklearn.preprocessing import StandardScaler
+
+    if name == 'MLP':
+        return make_pipeline(StandardScaler(), MLPRegressor(max_iter=2000, random_state=SEED, **params))
+    if name == 'RF':
+        return RandomForestRegressor(random_state=SEED, n_jobs=1, **params)
+    return GradientBoostingRegressor(random_state=SEED, **params)
+
+
+def param_combinations(grid):
+    keys = list(grid)
+    return [dict(zip(keys, values)) for values in itertools.product(*grid.values())]
+
+
+# --- Stages ---
+
+def build_features(years):
+    """year -> (counties, X, y) with y = log(Ratio), cached by the data version of the inputs."""
+    sources = sorted({f'df_{year}' for year in years} | {f'pres_election_{year}' for year in years}
+                     | set(feature_store.result_sources(years)) | {'census_alignment'})
+    # Versions only: the census tables are read (projected) by build_aligned on a cache miss
+    datastore.preload(sources, columns={f'df_{year}': ['Name'] for year in years})
+    path = os.path.join(CACHE_DIR, f'features.{datastore.version(sources)}.npz')
+    if not os.path.exists(path):
+        store = feature_store.build_aligned(years)
+        arrays = {}
+        for i, year in enumerate(store.years):
+            election = datastore.get(f'pres_election_{year}').set_index('Name').reindex(store.counties)
+            arrays[f'X_{year}'] = np.hstack([store.values[i], election[ELECTION_FEATURES].to_numpy(np.float32)])
+            arrays[f'y_{year}'] = np.log(store.ratio[i].astype(float))
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        np.savez(path, counties=np.array(store.counties), features=np.array(store.features), **arrays)
+    data = np.load(path)
+    matrices = {year: (list(data['counties']), data[f'X_{year}'], data[f'y_{year}']) for year in years}
+    return list(data['features']), matrices
+
+
+def _fold_score(task):
+    # Runs in a worker process: fit one (model, params) on one fold, return its MSE.
+    name, params, X_train, y_train, X_test, y_test = task
+    model = make_model(name, params).fit(X_train, y_train)
+    return float(np.mean((model.predict(X_test) - y_test) ** 2))
+
+
+def search(X, y, groups, jobs=None):
+    """Model name -> (best params, CV MSE), with every fold of every candidate fitted in parallel.
+
+    Folds are grouped by `groups` (the county of each row), so a county's rows
+    from different years never sit on both sides of a split.
+    """
+    from sklearn.model_selection import GroupKFold
+
+    folds = list(GroupKFold(CV_FOLDS).split(X, y, groups))
+    candidates = [(name, params) for name, grid in PARAM_GRIDS.items() for params in param_combinations(grid)]
+    tasks = [
+        (name, params, X[train], y[train], X[test], y[test])
+        for name, params in candidates
+        for train, test in folds
+    ]
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        scores = np.array(list(pool.map(_fold_score, tasks))).reshape(len(candidates), len(folds)).mean(axis=1)
+
+    best = {}
+    for (name, params), score in zip(candidates, scores):
+        if name not in best or score < best[name][1]:
+            best[name] = (params, float(score))
+    return best
+
+
+def _fit_one(args):
+    name, params, X, y = args
+    return make_model(name, params).fit(X, y)
+
+
+def run(train_years=('2016', '2020'), predict_year='2024', jobs=None,
+        model_dir=model_serving.MODEL_DIR, predictions_dir=PREDICTIONS_DIR):
+    import joblib
+
+    timings = {}
+    start = time.perf_counter()
+    feature_names, matrices = build_features(list(train_years) + [predict_year])
+    X = np.vstack([matrices[year][1] for year in train_years])
+    y = np.concatenate([matrices[year][2] for year in train_years])
+    groups = np.concatenate([matrices[year][0] for year in train_years])
+    keep = ~np.isnan(y)
+    X, y, groups = model_serving.fill_missing(X[keep]), y[keep], groups[keep]
+    timings['features'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    best = search(X, y, groups, jobs)
+    timings['search'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=jobs or os.cpu_count()) as pool:
+        models = dict(zip(best, pool.map(_fit_one, [(name, best[name][0], X, y) for name in best])))
+    timings['fit'] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    version = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')
+    os.makedirs(os.path.join(model_dir, version), exist_ok=True)
+    for name, model in models.items():
+        joblib.dump(model, os.path.join(model_dir, version, ARTIFACT_FILES[name]))
+    manifest = {
+        'version': version,
+        'year': predict_year,
+        'target': 'log_ratio',
+        'census_features': feature_names,
+        'election_features': ELECTION_FEATURES,
+        'models': {name: f'{version}/{ARTIFACT_FILES[name]}' for name in models},
+        'train_years': list(train_years),
+        'cv': {name: {'params': params, 'mse': score} for name, (params, score) in best.items()},
+    }
+
+    counties, X_predict, _ = matrices[predict_year]
+    predicted = model_serving.predict(X_predict, manifest, model_dir=model_dir)
+    actual = datastore.get(f'pres_election_{predict_year}').set_index('Name')['Ratio']
+    os.makedirs(predictions_dir, exist_ok=True)
+    for name, values in predicted.items():
+        path = os.path.join(predictions_dir, PREDICTION_FILES[name].replace('2024', predict_year))
+        model_serving._prediction_frame(counties, values, actual).to_csv(path, index=False)
+    timings['write'] = time.perf_counter() - start
+
+    manifest['timings'] = timings
+    tmp = os.path.join(model_dir, 'manifest.json.tmp')
+    with open(tmp, 'w') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, os.path.join(model_dir, 'manifest.json'))
+    for stage, seconds in timings.items():
+        logger.info('%-8s %.2fs', stage, seconds)
+    return manifest
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Train the MLP / RF / GB models and write their artifacts.')
+    parser.add_argument('--train-years', nargs='+', default=['2016', '2020'])
+    parser.add_argument('--predict-year', default='2024')
+    parser.add_argument('--jobs', type=int, default=None, help='worker processes (default: all cores)')
+    parser.add_argument('--model-dir', default=model_serving.MODEL_DIR)
+    parser.add_argument('--predictions-dir', default=PREDICTIONS_DIR)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format='%(message)s')
+    manifest = run(args.train_years, args.predict_year, args.jobs, args.model_dir, args.predictions_dir)
+    print(json.dumps({'version': manifest['version'], 'cv': manifest['cv'], 'timings': manifest['timings']}, indent=2))